@@ -0,0 +1,872 @@
+"""Clock model without any UI: settings, config persistence, face formatting,
+alarms and SNTP time sync
+
+main.py builds the Tk window and tray icon on top of this module. It does not
+import tkinter, so the model (and HeadlessClock) also runs where Tk is missing.
+"""
+
+import time
+from datetime import datetime, timedelta
+import threading
+import json
+import os
+import math
+import tempfile
+import socket
+import secrets
+import re
+import sys
+import zoneinfo
+import collections
+import select
+import struct
+
+CONFIG_FILE = os.path.join(os.path.expanduser('~'), '.transparent_clock_config.json')
+
+# Seconds between the NTP epoch (1900) and the Unix epoch (1970)
+NTP_EPOCH_OFFSET = 2208988800
+
+# Setting values the UI implements; kept here so config validation needs no Tk
+RENDERER_NAMES = ('label', 'canvas')
+THEMES = ('light', 'dark')
+STOPWATCH_RATES = (60, 30, 20, 10)
+TRAY_STYLES = ('static', 'analog', 'digital')
+
+# Ticks land just after the boundary so the new second is already current
+TICK_BOUNDARY_MARGIN = 0.002
+
+
+class TimeFormatter:
+    """Clock string formatter that caches the date per day and HH:MM per minute"""
+    
+    SECONDS = tuple(f':{s:02d}' for s in range(60))
+    
+    def __init__(self, time_format, show_seconds, show_date):
+        self.time_format = time_format
+        self.show_seconds = show_seconds
+        self.show_date = show_date
+        self.minute_pattern = '%I:%M' if time_format == '12h' else '%H:%M'
+        self.suffix_pattern = ' %p' if time_format == '12h' else ''
+        self.day_key = None
+        self.minute_key = None
+        self.date_prefix = ''
+        self.minute_text = ''
+        self.suffix_text = ''
+        self.minute_string = ''
+    
+    def format(self, now):
+        """Return the clock string for a datetime, recomputing only changed fields"""
+        day_key = (now.year, now.month, now.day)
+        if day_key != self.day_key:
+            self.day_key = day_key
+            self.minute_key = None
+            self.date_prefix = now.strftime('%a, %b %d') + '\n' if self.show_date else ''
+        
+        minute_key = now.hour * 60 + now.minute
+        if minute_key != self.minute_key:
+            self.minute_key = minute_key
+            self.minute_text = now.strftime(self.minute_pattern)
+            self.suffix_text = now.strftime(self.suffix_pattern) if self.suffix_pattern else ''
+            self.minute_string = self.date_prefix + self.minute_text + self.suffix_text
+        
+        if self.show_seconds:
+            return self.date_prefix + self.minute_text + self.SECONDS[now.second] + self.suffix_text
+        return self.minute_string
+
+
+class LatencyStats:
+    """Running mean, jitter, extremes and histogram of durations"""
+    
+    # Upper bounds of the histogram buckets, in milliseconds
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min_value = None
+        self.max_value = None
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        self.started = time.monotonic()
+    
+    def record(self, value):
+        """Record one duration in seconds"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+        
+        value_ms = value * 1000
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if value_ms < bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+    
+    def summary(self):
+        """Return statistics as a JSON-serializable dict"""
+        jitter = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        labels = [f'<{b}ms' for b in self.BUCKETS_MS] + [f'>={self.BUCKETS_MS[-1]}ms']
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean * 1000, 3),
+            'min_ms': round((self.min_value or 0.0) * 1000, 3),
+            'max_ms': round((self.max_value or 0.0) * 1000, 3),
+            'jitter_ms': round(jitter * 1000, 3),
+            'histogram': dict(zip(labels, self.histogram))
+        }
+
+
+class ZoneClock:
+    """UTC offset of one time zone, cached until its next DST transition"""
+    
+    # Transitions are found by probing forward in weekly steps, then bisecting
+    PROBE_STEP = 7 * 86400
+    PROBE_HORIZON = 366 * 86400
+    
+    def __init__(self, zone, label=None):
+        self.name = zone
+        self.zone = zoneinfo.ZoneInfo(zone)
+        self.label = label or zone.rsplit('/', 1)[-1].replace('_', ' ')
+        self.offset = 0
+        self.valid_from = 0
+        self.valid_until = 0
+        self.refreshes = 0
+    
+    def offset_at(self, ts):
+        """UTC offset in seconds at a POSIX timestamp"""
+        if not self.valid_from <= ts < self.valid_until:
+            self._refresh(ts)
+        return self.offset
+    
+    def _utcoffset(self, ts):
+        return int(datetime.fromtimestamp(ts, self.zone).utcoffset().total_seconds())
+    
+    def _refresh(self, ts):
+        self.refreshes += 1
+        self.offset = self._utcoffset(ts)
+        self.valid_from = ts
+        
+        # Find the first probe with a different offset, then bisect to the second
+        low = ts
+        high = None
+        probe = ts
+        while probe < ts + self.PROBE_HORIZON:
+            probe += self.PROBE_STEP
+            if self._utcoffset(probe) != self.offset:
+                high = probe
+                break
+            low = probe
+        if high is None:
+            self.valid_until = low
+            return
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._utcoffset(middle) == self.offset:
+                low = middle
+            else:
+                high = middle
+        self.valid_until = high
+
+
+class WorldClock:
+    """Formats many time zones from one shared timestamp per tick"""
+    
+    HOURS_24 = tuple(f'{h:02d}' for h in range(24))
+    HOURS_12 = tuple(f'{(h % 12) or 12:02d}' for h in range(24))
+    SUFFIX_12 = tuple(' AM' if h < 12 else ' PM' for h in range(24))
+    SUFFIX_24 = ('',) * 24
+    SIXTY = tuple(f':{n:02d}' for n in range(60))
+    
+    def __init__(self, zones, time_format='24h', show_seconds=True):
+        self.zones = zones
+        self.configure(time_format, show_seconds)
+    
+    @classmethod
+    def from_config(cls, entries, time_format='24h', show_seconds=True):
+        """Build from config entries like {'zone': 'Europe/London', 'label': 'London'}"""
+        zones = []
+        for entry in entries or []:
+            try:
+                if isinstance(entry, str):
+                    entry = {'zone': entry}
+                zones.append(ZoneClock(entry['zone'], entry.get('label')))
+            except (KeyError, TypeError, ValueError, zoneinfo.ZoneInfoNotFoundError) as e:
+                print(f"Error loading world clock {entry!r}: {e}")
+        return cls(zones, time_format, show_seconds)
+    
+    def configure(self, time_format, show_seconds):
+        twelve = time_format == '12h'
+        self.hours = self.HOURS_12 if twelve else self.HOURS_24
+        self.suffixes = self.SUFFIX_12 if twelve else self.SUFFIX_24
+        self.show_seconds = show_seconds
+        self.prefixes = [f'{zone.label}  ' for zone in self.zones]
+    
+    def format_all(self, ts):
+        """Return one 'Label  HH:MM[:SS]' string per zone"""
+        whole = int(ts)
+        hours = self.hours
+        suffixes = self.suffixes
+        sixty = self.SIXTY
+        show_seconds = self.show_seconds
+        result = []
+        for zone, prefix in zip(self.zones, self.prefixes):
+            seconds_of_day = (whole + zone.offset_at(whole)) % 86400
+            hour = seconds_of_day // 3600
+            text = prefix + hours[hour] + sixty[seconds_of_day // 60 % 60]
+            if show_seconds:
+                text += sixty[seconds_of_day % 60]
+            result.append(text + suffixes[hour])
+        return result
+    
+    def config_entries(self):
+        return [{'zone': zone.name, 'label': zone.label} for zone in self.zones]
+
+
+class Alarm:
+    """One alarm, recurring reminder or countdown"""
+    
+    KINDS = ('alarm', 'reminder', 'countdown')
+    
+    def __init__(self, kind, due, label='', repeat=None, notify=True, flash=True, alarm_id=None):
+        if kind not in self.KINDS:
+            raise ValueError(f'unknown alarm kind: {kind}')
+        self.id = alarm_id or secrets.token_hex(4)
+        self.kind = kind
+        self.due = float(due)
+        self.label = label
+        # None (one-shot), 'daily' (same local time every day) or an interval in seconds
+        if not (repeat is None or repeat == 'daily' or (
+                isinstance(repeat, (int, float)) and not isinstance(repeat, bool) and 0 < repeat < math.inf)):
+            raise ValueError(f"repeat must be 'daily' or a positive number of seconds, not {repeat!r}")
+        self.repeat = repeat
+        self.notify = notify
+        self.flash = flash
+    
+    @classmethod
+    def from_config(cls, entry):
+        return cls(
+            entry['kind'],
+            entry['due'],
+            entry.get('label', ''),
+            entry.get('repeat'),
+            entry.get('notify', True),
+            entry.get('flash', True),
+            entry.get('id')
+        )
+    
+    def config_entry(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'due': self.due,
+            'label': self.label,
+            'repeat': self.repeat,
+            'notify': self.notify,
+            'flash': self.flash
+        }
+    
+    def next_due(self, now):
+        """First occurrence strictly after now, or None for one-shots"""
+        if self.repeat == 'daily':
+            due = datetime.fromtimestamp(self.due)
+            day = max(due.date(), datetime.fromtimestamp(now).date())
+            # Rebuild from the local date so DST changes keep the wall time
+            while True:
+                candidate = datetime.combine(day, due.time()).timestamp()
+                if candidate > now:
+                    return candidate
+                day += timedelta(days=1)
+        if self.repeat:
+            interval = float(self.repeat)
+            return self.due + (math.floor((now - self.due) / interval) + 1) * interval
+        return None
+
+
+def ntp_timestamp(ts):
+    """Pack a Unix timestamp as a 64-bit NTP timestamp"""
+    seconds = ts + NTP_EPOCH_OFFSET
+    whole = int(seconds)
+    return struct.pack('!II', whole, int((seconds - whole) * 2 ** 32) & 0xffffffff)
+
+
+def from_ntp_timestamp(data):
+    whole, fraction = struct.unpack('!II', data)
+    return whole - NTP_EPOCH_OFFSET + fraction / 2 ** 32
+
+
+def parse_ntp_server(server):
+    """Split 'host' or 'host:port' into a (host, port) address"""
+    host, _, port = server.partition(':')
+    return host, int(port) if port else 123
+
+
+def sntp_query(address, timeout=1.0):
+    """One SNTP exchange over a non-blocking UDP socket; returns (offset, delay) in seconds"""
+    family, _, _, _, sockaddr = socket.getaddrinfo(*address, type=socket.SOCK_DGRAM)[0]
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        t1 = time.time()
+        transmit = ntp_timestamp(t1)
+        # LI 0, version 4, mode 3 (client); only the transmit timestamp is set
+        sock.sendto(b'\x23' + bytes(39) + transmit, sockaddr)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'no SNTP reply from {address[0]}')
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                continue
+            data = sock.recv(512)
+            t4 = time.time()
+            # Skip stray or late replies to an earlier request
+            if len(data) >= 48 and data[24:32] == transmit:
+                break
+    
+    leap, mode, stratum = data[0] >> 6, data[0] & 0x7, data[1]
+    if mode not in (4, 5) or stratum == 0 or leap == 3:
+        raise ValueError(f'unusable SNTP reply (mode {mode}, stratum {stratum}, leap {leap})')
+    t2 = from_ntp_timestamp(data[32:40])
+    t3 = from_ntp_timestamp(data[40:48])
+    return ((t2 - t1) + (t3 - t4)) / 2, (t4 - t1) - (t3 - t2)
+
+
+class TimeSync:
+    """Background SNTP client whose offset estimate is slewed in gradually
+    
+    Each sync takes several samples, drops those with unusually long round
+    trips (asymmetric paths skew the offset) and uses the median offset of
+    the rest. The applied offset then moves toward that estimate at a
+    bounded rate, so the displayed time never jumps. Failed syncs are
+    retried with exponential backoff. Everything except offset() runs on
+    the sync thread.
+    """
+    
+    SAMPLES = 4
+    SAMPLE_GAP = 0.25
+    TIMEOUT = 1.0
+    # Seconds of correction applied per second of wall time
+    SLEW_RATE = 0.05
+    # Offsets this large would take too long to slew and are stepped
+    STEP_THRESHOLD = 60.0
+    
+    def __init__(self, server, interval=1024.0, min_retry=16.0, max_retry=1024.0, samples=SAMPLES,
+                 sample_gap=SAMPLE_GAP, offset=0.0, monotonic=time.monotonic):
+        self.server = server
+        self.address = parse_ntp_server(server)
+        self.interval = interval
+        self.min_retry = min_retry
+        self.max_retry = max_retry
+        self.samples = samples
+        self.sample_gap = sample_gap
+        self.monotonic = monotonic
+        # (offset at slew start, monotonic slew start, target offset); replaced as
+        # a whole so the Tk thread always reads a consistent triple. A carried
+        # over offset is held until the first sync slews away from it
+        self.slew = (offset, monotonic(), offset)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.syncs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.retry = min_retry
+        self.retry_delays = collections.deque(maxlen=8)
+        self.last_delay = None
+        self.last_sync = None
+        self.last_error = None
+        self.discarded = 0
+        self.next_sync = None
+    
+    def offset(self):
+        """Offset to add to time.time(), moving toward the latest estimate"""
+        start, started, target = self.slew
+        step = self.SLEW_RATE * (self.monotonic() - started)
+        if abs(target - start) <= step:
+            return target
+        return start + math.copysign(step, target - start)
+    
+    def set_target(self, target):
+        current = self.offset()
+        if abs(target - current) > self.STEP_THRESHOLD:
+            current = target
+        self.slew = (current, self.monotonic(), target)
+    
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='time-sync', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def sync_once(self):
+        """Sample the server and update the target offset; returns True on success"""
+        samples = []
+        for i in range(self.samples):
+            if i and self.stop_event.wait(self.sample_gap):
+                return False
+            try:
+                samples.append(sntp_query(self.address, self.TIMEOUT))
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+        if not samples:
+            return False
+        
+        best = min(delay for _, delay in samples)
+        kept = sorted(offset for offset, delay in samples if delay <= 2 * best + 0.005)
+        self.discarded += len(samples) - len(kept)
+        self.set_target(kept[len(kept) // 2])
+        self.last_delay = best
+        self.last_sync = time.time()
+        self.last_error = None
+        return True
+    
+    def next_wait(self, ok):
+        """Record a sync result; returns seconds until the next attempt"""
+        if ok:
+            self.syncs += 1
+            self.consecutive_failures = 0
+            self.retry = self.min_retry
+            return self.interval
+        self.failures += 1
+        self.consecutive_failures += 1
+        wait = self.retry
+        self.retry_delays.append(wait)
+        self.retry = min(self.retry * 2, self.max_retry)
+        return wait
+    
+    def _run(self):
+        while not self.stop_event.is_set():
+            wait = self.next_wait(self.sync_once())
+            self.next_sync = self.monotonic() + wait
+            self.stop_event.wait(wait)
+    
+    def stats(self):
+        start, started, target = self.slew
+        return {
+            'server': self.server,
+            'offset_ms': round(self.offset() * 1000, 3),
+            'target_offset_ms': round(target * 1000, 3),
+            'delay_ms': round(self.last_delay * 1000, 3) if self.last_delay is not None else None,
+            'last_sync_ago_s': round(time.time() - self.last_sync, 1) if self.last_sync else None,
+            'next_sync_in_s': round(self.next_sync - self.monotonic(), 1) if self.next_sync else None,
+            'syncs': self.syncs,
+            'failures': self.failures,
+            'discarded_samples': self.discarded,
+            'last_error': self.last_error
+        }
+
+
+class SNTPServer:
+    """Local stand-in SNTP server for tests, answering from its own clock plus an offset
+    
+    delay simulates a symmetric network round trip; every spike_every-th reply
+    is held back an extra spike seconds after its transmit timestamp, which
+    skews that sample's offset like an asymmetric path would.
+    """
+    
+    def __init__(self, offset=0.0, delay=0.0, spike_every=0, spike=0.0, drop=False, host='127.0.0.1', port=0):
+        self.offset = offset
+        self.delay = delay
+        self.spike_every = spike_every
+        self.spike = spike
+        self.drop = drop
+        self.requests = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.2)
+        self.address = self.sock.getsockname()
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, name='sntp-server', daemon=True)
+        self.thread.start()
+    
+    def _serve(self):
+        while self.running:
+            try:
+                request, peer = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self.requests += 1
+            if self.drop or len(request) < 48:
+                continue
+            time.sleep(self.delay / 2)
+            receive = ntp_timestamp(time.time() + self.offset)
+            transmit = ntp_timestamp(time.time() + self.offset)
+            time.sleep(self.delay / 2)
+            if self.spike_every and self.requests % self.spike_every == 0:
+                time.sleep(self.spike)
+            # LI 0, version 4, mode 4 (server), stratum 1
+            reply = struct.pack('!BBbb', 0x24, 1, 4, -20) + bytes(8) + b'LOCL'
+            reply += receive + request[40:48] + receive + transmit
+            try:
+                self.sock.sendto(reply, peer)
+            except OSError:
+                return
+    
+    def close(self):
+        self.running = False
+        self.thread.join(1.0)
+        self.sock.close()
+
+
+class ConfigWriter:
+    """Debounced, coalescing background writer for the config file"""
+    
+    def __init__(self, path, delay=0.5, max_delay=2.0):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self.cond = threading.Condition()
+        self.pending = None
+        self.first_pending = None
+        self.due = None
+        self.writing = False
+        self.closed = False
+        self.last_written = None
+        # (mtime_ns, size) of the files this writer produced recently, so a
+        # config watcher can tell its own writes from external edits
+        self.own_signatures = collections.deque(maxlen=8)
+        
+        # Counters
+        self.requested = 0
+        self.written = 0
+        self.coalesced = 0
+        self.unchanged = 0
+        self.errors = 0
+        
+        self.thread = threading.Thread(target=self._run, name='config-writer', daemon=True)
+        self.thread.start()
+    
+    def submit(self, config):
+        """Queue a config snapshot; newer snapshots replace pending ones"""
+        now = time.monotonic()
+        with self.cond:
+            self.requested += 1
+            if self.pending is not None:
+                self.coalesced += 1
+            else:
+                self.first_pending = now
+            self.pending = dict(config)
+            # Keep pushing the write back while changes arrive, but not forever
+            self.due = min(now + self.delay, self.first_pending + self.max_delay)
+            self.cond.notify_all()
+    
+    def flush(self, timeout=None):
+        """Write any pending snapshot now and wait until it is on disk"""
+        with self.cond:
+            if self.pending is not None:
+                self.due = time.monotonic()
+                self.cond.notify_all()
+            return self.cond.wait_for(lambda: self.pending is None and not self.writing, timeout)
+    
+    def close(self, timeout=2.0):
+        """Flush and stop the writer thread"""
+        self.flush(timeout)
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+    
+    def wrote(self, signature):
+        """Whether a file signature belongs to one of this writer's recent writes"""
+        with self.cond:
+            return signature in self.own_signatures
+    
+    def forget_written(self):
+        """The file was changed or removed by someone else; the next snapshot must be written"""
+        with self.cond:
+            self.last_written = None
+    
+    def stats(self):
+        with self.cond:
+            return {
+                'requested': self.requested,
+                'written': self.written,
+                'avoided': self.coalesced + self.unchanged,
+                'coalesced': self.coalesced,
+                'unchanged': self.unchanged,
+                'errors': self.errors
+            }
+    
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None or (not self.closed and time.monotonic() < self.due):
+                    if self.pending is None:
+                        if self.closed:
+                            return
+                        self.cond.wait()
+                    else:
+                        self.cond.wait(self.due - time.monotonic())
+                config = self.pending
+                self.pending = None
+                self.writing = True
+            
+            try:
+                if config == self.last_written:
+                    with self.cond:
+                        self.unchanged += 1
+                else:
+                    self._write(config)
+                    self.last_written = config
+                    with self.cond:
+                        self.written += 1
+            except Exception as e:
+                print(f"Error saving config: {e}")
+                with self.cond:
+                    self.errors += 1
+            finally:
+                with self.cond:
+                    self.writing = False
+                    self.cond.notify_all()
+    
+    def _write(self, config):
+        """Atomically replace the config file via a temp file + rename"""
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.transparent_clock_', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                st = os.fstat(f.fileno())
+            # The rename keeps the file's mtime and size
+            with self.cond:
+                self.own_signatures.append((st.st_mtime_ns, st.st_size))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def config_file_signature(path):
+    """(mtime_ns, size) of a file, or None if it does not exist; cheap change detection"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ClockModel:
+    """Clock settings, config persistence and face formatting, with no UI attached
+    
+    TransparentClock adds the Tk window and tray icon on top of this model;
+    HeadlessClock drives it without a display.
+    """
+    
+    # Lowest opacity the slider allows, so the clock cannot vanish entirely
+    MIN_OPACITY = 0.2
+    
+    DEFAULT_CONFIG = {
+        'font_size': 26,
+        'text_color': '#000000',
+        'time_format': '24h',
+        'show_seconds': True,
+        'show_date': False,
+        'x_position': None,
+        'y_position': 20,
+        'opacity': 0.95,
+        'renderer': 'label',
+        'suspend_when_idle': False,
+        'idle_timeout': 300,
+        'stall_threshold_ms': 0,
+        'world_clocks': [],
+        'alarms': [],
+        'stopwatch_hz': 30,
+        'stopwatch_precision': 2,
+        'theme': 'light',
+        'tray_icon': 'static',
+        'time_sync': False,
+        'ntp_server': 'pool.ntp.org',
+        'clock_font': None
+    }
+    
+    def __init__(self, config_file=CONFIG_FILE):
+        self.config_file = config_file
+        self.time_sync = None
+        self.load_config()
+        self.config_writer = ConfigWriter(self.config_file)
+        self.last_time_text = None
+        self.restart_formatter()
+    
+    def load_config(self):
+        """Load saved configuration or use defaults"""
+        self.config_signature = config_file_signature(self.config_file)
+        try:
+            config = self.read_config()
+        except Exception as e:
+            print(f"Error loading config: {e}")
+            config = dict(self.DEFAULT_CONFIG)
+        
+        for name, value in self.settings_from_config(config).items():
+            setattr(self, name, value)
+    
+    def read_config(self):
+        """Read the config file merged over the defaults; raises if it cannot be parsed"""
+        config = dict(self.DEFAULT_CONFIG)
+        if os.path.exists(self.config_file):
+            with open(self.config_file, 'r') as f:
+                loaded = json.load(f)
+            if not isinstance(loaded, dict):
+                raise ValueError('config file does not hold a JSON object')
+            # Merge with defaults
+            config.update(loaded)
+        return config
+    
+    def settings_from_config(self, config):
+        """Validate a merged config into attribute values; bad fields fall back to their defaults"""
+        def pick(key, valid):
+            value = config[key]
+            if valid(value):
+                return value
+            print(f"Error in config: invalid {key} {value!r}, using {self.DEFAULT_CONFIG[key]!r}")
+            return self.DEFAULT_CONFIG[key]
+        
+        def is_int(value):
+            return isinstance(value, int) and not isinstance(value, bool)
+        
+        def is_number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+        
+        settings = {
+            'font_size': pick('font_size', lambda v: is_int(v) and 12 <= v <= 72),
+            'text_color': pick('text_color', lambda v: isinstance(v, str) and self.valid_color(v)),
+            'time_format': pick('time_format', lambda v: v in ('12h', '24h')),
+            'show_seconds': pick('show_seconds', lambda v: isinstance(v, bool)),
+            'show_date': pick('show_date', lambda v: isinstance(v, bool)),
+            'x_position': pick('x_position', lambda v: v is None or is_int(v)),
+            'y_position': pick('y_position', is_int),
+            'opacity': min(1.0, max(self.MIN_OPACITY, float(pick('opacity', is_number)))),
+            'renderer': pick('renderer', lambda v: v in RENDERER_NAMES),
+            'suspend_when_idle': pick('suspend_when_idle', lambda v: isinstance(v, bool)),
+            'idle_timeout': pick('idle_timeout', lambda v: is_number(v) and v > 0),
+            'stall_threshold_ms': pick('stall_threshold_ms', lambda v: is_int(v) and v >= 0),
+            'alarm_entries': pick('alarms', lambda v: isinstance(v, list)),
+            'stopwatch_hz': pick('stopwatch_hz', lambda v: v in STOPWATCH_RATES),
+            'stopwatch_precision': pick('stopwatch_precision', lambda v: v in (1, 2)),
+            'theme_mode': pick('theme', lambda v: v in THEMES),
+            'tray_style': pick('tray_icon', lambda v: v in TRAY_STYLES),
+            'time_sync_enabled': pick('time_sync', lambda v: isinstance(v, bool)),
+            'ntp_server': pick('ntp_server', lambda v: isinstance(v, str) and
+                               re.fullmatch(r'[\w.-]+(?::\d{1,5})?', v) is not None),
+            'clock_font': pick('clock_font', lambda v: v is None or (isinstance(v, str) and self.valid_font_family(v)))
+        }
+        settings['world_clock'] = WorldClock.from_config(
+            pick('world_clocks', lambda v: isinstance(v, list)), settings['time_format'], settings['show_seconds']
+        )
+        
+        # Calculate x_position if not saved
+        if settings['x_position'] is None:
+            settings['x_position'] = self.default_x_position()
+        return settings
+    
+    def default_x_position(self):
+        return 20
+    
+    def valid_color(self, color):
+        """Hex colors only; without Tk there is no color name table to check against"""
+        return re.fullmatch(r'#(?:[0-9a-fA-F]{3}){1,2}', color) is not None
+    
+    def valid_font_family(self, family):
+        return bool(family.strip())
+    
+    def config_dict(self):
+        """Current settings in config file form"""
+        return {
+            'font_size': self.font_size,
+            'text_color': self.text_color,
+            'time_format': self.time_format,
+            'show_seconds': self.show_seconds,
+            'show_date': self.show_date,
+            'x_position': self.x_position,
+            'y_position': self.y_position,
+            'opacity': self.opacity,
+            'renderer': self.renderer,
+            'suspend_when_idle': self.suspend_when_idle,
+            'idle_timeout': self.idle_timeout,
+            'stall_threshold_ms': self.stall_threshold_ms,
+            'world_clocks': self.world_clock.config_entries(),
+            'alarms': self.alarm_entries,
+            'stopwatch_hz': self.stopwatch_hz,
+            'stopwatch_precision': self.stopwatch_precision,
+            'theme': self.theme_mode,
+            'tray_icon': self.tray_style,
+            'time_sync': self.time_sync_enabled,
+            'ntp_server': self.ntp_server,
+            'clock_font': self.clock_font
+        }
+    
+    def save_config(self):
+        """Queue current configuration for the background writer"""
+        self.config_writer.submit(self.config_dict())
+    
+    def restart_formatter(self):
+        """Rebuild the formatter after a format setting changed"""
+        self.time_formatter = TimeFormatter(self.time_format, self.show_seconds, self.show_date)
+        self.world_clock.configure(self.time_format, self.show_seconds)
+    
+    def now(self):
+        """Unix time corrected by the SNTP offset when time sync is on"""
+        if self.time_sync is None:
+            return time.time()
+        return time.time() + self.time_sync.offset()
+    
+    def format_face(self, ts):
+        """Clock face text and world clock rows for a Unix timestamp"""
+        time_string = self.time_formatter.format(datetime.fromtimestamp(ts))
+        return time_string, self.world_clock.format_all(ts) if self.world_clock.zones else []
+
+
+class HeadlessClock(ClockModel):
+    """Clock model ticking without Tk or a tray icon, printing each new face"""
+    
+    def __init__(self, config_file=CONFIG_FILE, out=None):
+        super().__init__(config_file)
+        self.out = out or sys.stdout
+    
+    def tick(self, ts):
+        """Format one tick; returns the face line if it changed, else None"""
+        time_string, world = self.format_face(ts)
+        line = ' | '.join([time_string.replace('\n', ' ')] + world)
+        if line == self.last_time_text:
+            return None
+        self.last_time_text = line
+        return line
+    
+    def run(self, duration=None):
+        """Print the face on every period boundary until duration elapses or Ctrl+C"""
+        period = 1.0 if self.show_seconds else 60.0
+        end = None if not duration else time.monotonic() + duration
+        if self.time_sync_enabled:
+            self.time_sync = TimeSync(self.ntp_server)
+            self.time_sync.start()
+        try:
+            while True:
+                ts = self.now()
+                line = self.tick(ts)
+                if line is not None:
+                    print(line, file=self.out, flush=True)
+                delay = period - (ts % period) + TICK_BOUNDARY_MARGIN
+                if end is not None and time.monotonic() + delay > end:
+                    break
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.time_sync is not None:
+                self.time_sync.stop()
+            self.config_writer.close()
@@ -1,36 +1,1941 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
-from tkinter import colorchooser
-from datetime import datetime
+import tkinter.font as tkfont
+from datetime import datetime, timedelta, time as dt_time
 import platform
-from PIL import Image, ImageDraw, ImageTk
-import pystray
-from pystray import MenuItem as item
 import threading
 import json
 import os
+import math
+import argparse
+import tempfile
+import socket
+import secrets
+import hmac
+import re
+import sys
+import io
+import queue
+import traceback
+import colorsys
+import zoneinfo
+import heapq
+import itertools
+import collections
+import importlib.util
+
+from clock_core import (
+    CONFIG_FILE, STOPWATCH_RATES, TRAY_STYLES, TICK_BOUNDARY_MARGIN, TimeFormatter, LatencyStats,
+    ZoneClock, WorldClock, Alarm, TimeSync, SNTPServer, ConfigWriter, config_file_signature,
+    ClockModel, HeadlessClock
+)
+
+# PIL and pystray are imported lazily (tray icon, glyph renderer) to keep
+# them off the startup critical path
+
+TRAY_ICON_VERSION = 1
+
+# Single-instance control channel
+IPC_FILE = os.path.join(os.path.expanduser('~'), '.transparent_clock_ipc.json')
+LOCK_FILE = os.path.join(os.path.expanduser('~'), '.transparent_clock.lock')
+IPC_MAX_MESSAGE = 4096
+
+# Stall reports land here too; the windowed exe has no stdout
+STALL_LOG_FILE = os.path.join(os.path.dirname(CONFIG_FILE), '.transparent_clock_stalls.log')
+
+
+
+class Theme:
+    """Shared fonts and color tokens for every widget, resolved once at startup"""
+    
+    PALETTES = {
+        'light': {
+            'surface': '#f7f7f7',
+            'border': '#c7c7cc',
+            'shadow': '#d0d0d0',
+            'separator': '#d1d1d6',
+            'text': '#1d1d1f',
+            'secondary': '#86868b',
+            'field': '#ffffff',
+            'trough': '#e5e5e5',
+            'accent': '#0066ff',
+            'accent_hover': '#0052cc',
+            'on_accent': '#ffffff',
+            'menu': '#ffffff',
+            'menu_text': '#000000',
+            'menu_active': '#0078d7'
+        },
+        'dark': {
+            'surface': '#2c2c2e',
+            'border': '#48484a',
+            'shadow': '#1c1c1e',
+            'separator': '#3a3a3c',
+            'text': '#f5f5f7',
+            'secondary': '#98989d',
+            'field': '#1c1c1e',
+            'trough': '#3a3a3c',
+            'accent': '#0a84ff',
+            'accent_hover': '#409cff',
+            'on_accent': '#ffffff',
+            'menu': '#2c2c2e',
+            'menu_text': '#f5f5f7',
+            'menu_active': '#0a84ff'
+        }
+    }
+    
+    # role: (family key, macOS size, size elsewhere, weight)
+    ROLES = {
+        'title': ('display', 15, 12, 'bold'),
+        'body': ('text', 12, 10, 'normal'),
+        'caption': ('text', 11, 9, 'normal'),
+        'button': ('text', 14, 11, 'bold'),
+        'value': ('display', 24, 18, 'bold'),
+        'marker': ('text', 18, 14, 'bold'),
+        'unit': ('text', 14, 10, 'normal'),
+        'mono': ('mono', 10, 9, 'normal'),
+        'clock': ('clock', 48, 48, 'bold'),
+        'world': ('clock', 24, 24, 'normal')
+    }
+    
+    # Widget options that take a color token
+    COLOR_OPTIONS = {
+        'bg', 'fg', 'activebackground', 'activeforeground', 'selectcolor', 'troughcolor',
+        'highlightbackground', 'highlightcolor', 'insertbackground'
+    }
+    
+    def __init__(self, root, mode='light', clock_family=None):
+        self.root = root
+        self.mac = platform.system() == 'Darwin'
+        self.families = {
+            'display': 'SF Pro Display' if self.mac else 'Segoe UI',
+            'text': 'SF Pro Text' if self.mac else 'Segoe UI',
+            'mono': 'Menlo' if self.mac else 'Consolas'
+        }
+        self.families['clock'] = clock_family or self.families['display']
+        self.mode = mode if mode in self.PALETTES else 'light'
+        self.colors = dict(self.PALETTES[self.mode])
+        self.fonts = {}
+        for role, (family, mac_size, size, weight) in self.ROLES.items():
+            self.fonts[role] = tkfont.Font(
+                root=root,
+                family=self.families[family],
+                size=mac_size if self.mac else size,
+                weight=weight
+            )
+        self.painted = []
+    
+    def __getitem__(self, token):
+        return self.colors[token]
+    
+    def create(self, widget_class, parent, **options):
+        """Create a widget; font roles and color tokens are resolved and tracked for retheming"""
+        tokens = {key: value for key, value in options.items()
+                  if key in self.COLOR_OPTIONS and value in self.colors}
+        options.update((key, self.colors[token]) for key, token in tokens.items())
+        if isinstance(options.get('font'), str):
+            options['font'] = self.fonts[options['font']]
+        widget = widget_class(parent, **options)
+        if tokens:
+            self.painted.append((widget, tokens))
+        return widget
+    
+    def paint(self, widget, **tokens):
+        """Recolor a widget from color tokens"""
+        widget.config(**{key: self.colors[token] for key, token in tokens.items()})
+    
+    def track(self, widget, **tokens):
+        """Color an existing widget from tokens and keep it in step with retheming"""
+        self.paint(widget, **tokens)
+        self.painted.append((widget, tokens))
+        return widget
+    
+    def set_mode(self, mode):
+        """Switch palette and recolor every tracked widget in place"""
+        if mode not in self.PALETTES or mode == self.mode:
+            return False
+        self.mode = mode
+        self.colors = dict(self.PALETTES[mode])
+        live = []
+        for widget, tokens in self.painted:
+            try:
+                self.paint(widget, **tokens)
+            except tk.TclError:
+                continue
+            live.append((widget, tokens))
+        self.painted = live
+        return True
+    
+    def set_clock_size(self, size, world_size):
+        """Resize the clock face and world clock fonts; widgets using them follow"""
+        self.fonts['clock'].configure(size=size)
+        self.fonts['world'].configure(size=world_size)
+    
+    def set_clock_family(self, family=None):
+        """Switch the clock face and world clock fonts; None restores the display family"""
+        family = family or self.families['display']
+        if family == self.families['clock']:
+            return False
+        self.families['clock'] = family
+        for role, (font_family, *_) in self.ROLES.items():
+            if font_family == 'clock':
+                self.fonts[role].configure(family=family)
+        return True
+    
+    @property
+    def clock_family(self):
+        return self.families['clock']
+
 
 class SimpleContextMenu(tk.Menu):
     """Simple working context menu"""
-    def __init__(self, parent):
-        super().__init__(parent, tearoff=0, 
-                        bg='#ffffff',
-                        fg='#000000',
-                        activebackground='#0078d7',
-                        activeforeground='#ffffff',
-                        font=('Segoe UI', 10),
+    def __init__(self, parent, theme):
+        super().__init__(parent, tearoff=0,
+                        font=theme.fonts['body'],
                         relief=tk.FLAT,
                         borderwidth=1)
+        theme.track(self, bg='menu', fg='menu_text', activebackground='menu_active', activeforeground='on_accent')
+
+
+def strftime_time_string(now, time_format, show_seconds, show_date):
+    """Format a clock string with plain strftime calls (reference path)"""
+    if time_format == '12h':
+        if show_seconds:
+            time_string = now.strftime('%I:%M:%S %p')
+        else:
+            time_string = now.strftime('%I:%M %p')
+    else:
+        if show_seconds:
+            time_string = now.strftime('%H:%M:%S')
+        else:
+            time_string = now.strftime('%H:%M')
+    
+    if show_date:
+        date_string = now.strftime('%a, %b %d')
+        time_string = f'{date_string}\n{time_string}'
+    
+    return time_string
+
+
+def bench_format(ticks):
+    """Compare per-tick cost of TimeFormatter against plain strftime"""
+    start = datetime.now().replace(microsecond=0)
+    moments = [start + timedelta(seconds=i) for i in range(ticks)]
+    results = []
+    
+    for time_format in ('12h', '24h'):
+        for show_seconds in (True, False):
+            for show_date in (True, False):
+                t0 = time.perf_counter_ns()
+                for now in moments:
+                    strftime_time_string(now, time_format, show_seconds, show_date)
+                legacy_ns = (time.perf_counter_ns() - t0) / ticks
+                
+                formatter = TimeFormatter(time_format, show_seconds, show_date)
+                t0 = time.perf_counter_ns()
+                for now in moments:
+                    formatter.format(now)
+                cached_ns = (time.perf_counter_ns() - t0) / ticks
+                
+                for now in moments[:3600]:
+                    assert formatter.format(now) == strftime_time_string(now, time_format, show_seconds, show_date)
+                
+                results.append({
+                    'time_format': time_format,
+                    'show_seconds': show_seconds,
+                    'show_date': show_date,
+                    'strftime_ns_per_tick': round(legacy_ns, 1),
+                    'formatter_ns_per_tick': round(cached_ns, 1),
+                    'speedup': round(legacy_ns / cached_ns, 2) if cached_ns else None
+                })
+    
+    return results
+
+
+def bench_zones(counts, ticks):
+    """Per-tick cost of formatting N zones: cached offsets vs a tz conversion per zone"""
+    names = sorted(zoneinfo.available_timezones())
+    results = []
+    for count in counts:
+        selected = (names * (count // max(1, len(names)) + 1))[:count]
+        world = WorldClock([ZoneClock(name) for name in selected])
+        infos = [zone.zone for zone in world.zones]
+        start = time.time()
+        
+        t0 = time.perf_counter_ns()
+        for i in range(ticks):
+            now = start + i
+            for info in infos:
+                datetime.fromtimestamp(now, info).strftime('%H:%M:%S')
+        naive_ns = (time.perf_counter_ns() - t0) / ticks
+        
+        world.format_all(start)
+        t0 = time.perf_counter_ns()
+        for i in range(ticks):
+            world.format_all(start + i)
+        cached_ns = (time.perf_counter_ns() - t0) / ticks
+        
+        results.append({
+            'zones': count,
+            'tz_convert_us_per_tick': round(naive_ns / 1000, 2),
+            'cached_us_per_tick': round(cached_ns / 1000, 2),
+            'cached_ns_per_zone': round(cached_ns / count, 1) if count else 0.0
+        })
+    return results
+
+
+class AlarmEngine:
+    """Heap of pending alarms with a single precise wakeup for the earliest one
+    
+    Entries are keyed on wall-clock time. Each occurrence is advanced before
+    it fires, so restarts, clock changes and sleep/resume fire a missed alarm
+    at most once. Waits are capped so a wall-clock jump is noticed quickly.
+    """
+    
+    MAX_WAIT_MS = 60000
+    
+    def __init__(self, root, on_fire, on_change=None, clock=time.time):
+        self.root = root
+        self.on_fire = on_fire
+        self.on_change = on_change
+        self.clock = clock
+        self.wakeups = 0
+        self.alarms = {}
+        self.heap = []
+        self.counter = itertools.count()
+        self.after_id = None
+        self.fired = 0
+    
+    def load(self, entries):
+        for entry in entries or []:
+            try:
+                alarm = Alarm.from_config(entry)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error loading alarm {entry!r}: {e}")
+                continue
+            self.alarms[alarm.id] = alarm
+            heapq.heappush(self.heap, (alarm.due, next(self.counter), alarm.id))
+        self.reschedule()
+    
+    def add(self, alarm):
+        self.alarms[alarm.id] = alarm
+        heapq.heappush(self.heap, (alarm.due, next(self.counter), alarm.id))
+        self._changed()
+        return alarm
+    
+    def remove(self, alarm_id):
+        """Remove an alarm; its heap entry is dropped lazily when it surfaces"""
+        if self.alarms.pop(alarm_id, None) is not None:
+            self._changed()
+            return True
+        return False
+    
+    def clear(self):
+        self.alarms.clear()
+        self.heap = []
+        self._changed()
+    
+    def next_alarm(self):
+        """Earliest live alarm, discarding stale heap entries on the way"""
+        while self.heap:
+            due, _, alarm_id = self.heap[0]
+            alarm = self.alarms.get(alarm_id)
+            if alarm is not None and alarm.due == due:
+                return alarm
+            heapq.heappop(self.heap)
+        return None
+    
+    def reschedule(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        alarm = self.next_alarm()
+        if alarm is None:
+            return
+        delay_ms = max(0, math.ceil((alarm.due - self.clock()) * 1000))
+        self.after_id = self.root.after(min(delay_ms, self.MAX_WAIT_MS), self._run_due)
+    
+    def cancel(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+    
+    def _run_due(self):
+        self.after_id = None
+        self.wakeups += 1
+        now = self.clock()
+        fired = []
+        while True:
+            alarm = self.next_alarm()
+            if alarm is None or alarm.due > now:
+                break
+            heapq.heappop(self.heap)
+            missed = now - alarm.due
+            try:
+                following = alarm.next_due(now)
+                if following is not None and following <= now:
+                    raise ValueError(f'next occurrence {following} is not after now')
+            except (TypeError, ValueError, OverflowError) as e:
+                # Drop a broken alarm rather than stalling every other one
+                print(f"Error scheduling alarm {alarm.id}: {e}")
+                following = None
+            if following is None:
+                del self.alarms[alarm.id]
+            else:
+                alarm.due = following
+                heapq.heappush(self.heap, (alarm.due, next(self.counter), alarm.id))
+            fired.append((alarm, missed))
+        
+        if fired:
+            self._changed()
+            for alarm, missed in fired:
+                self.fired += 1
+                try:
+                    self.on_fire(alarm, missed)
+                except Exception as e:
+                    print(f"Error announcing alarm {alarm.id}: {e}")
+        else:
+            self.reschedule()
+    
+    def _changed(self):
+        self.reschedule()
+        if self.on_change:
+            self.on_change()
+    
+    def config_entries(self):
+        return [alarm.config_entry() for alarm in sorted(self.alarms.values(), key=lambda a: a.due)]
+    
+    def stats(self):
+        alarm = self.next_alarm()
+        return {
+            'pending': len(self.alarms),
+            'heap_size': len(self.heap),
+            'fired': self.fired,
+            'next_due': datetime.fromtimestamp(alarm.due).isoformat(timespec='seconds') if alarm else None
+        }
+
+
+class StopwatchMode:
+    """Stopwatch / countdown face redrawn by a frame loop on perf_counter
+    
+    Frames are scheduled against perf_counter deadlines; when the loop falls
+    behind, late frames are skipped rather than queued. If rendering keeps
+    exceeding its share of the frame, the refresh rate steps down.
+    """
+    
+    RATES = STOPWATCH_RATES
+    BUDGET_FRACTION = 0.5
+    OVER_BUDGET_FRAMES = 3
+    TWO_DIGITS = tuple(f'{n:02d}' for n in range(100))
+    
+    def __init__(self, root, render, on_finish=None, on_change=None, hz=30, precision=2):
+        self.root = root
+        self.render = render
+        self.on_finish = on_finish
+        self.on_change = on_change
+        self.target_hz = hz
+        self.hz = hz
+        self.precision = precision
+        self.kind = None
+        self.running = False
+        self.visible = True
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.duration = 0.0
+        self.after_id = None
+        self.deadline = 0.0
+        self.last_units = None
+        
+        self.frame_time = LatencyStats()
+        self.frames = 0
+        self.skipped_frames = 0
+        self.over_budget = 0
+        self.consecutive_over = 0
+        self.rate_drops = 0
+    
+    @property
+    def active(self):
+        return self.kind is not None
+    
+    def start_stopwatch(self):
+        """Switch to stopwatch mode (from zero) and start it"""
+        self.cancel()
+        self.kind = 'stopwatch'
+        self.elapsed = 0.0
+        self._changed()
+        self.resume()
+    
+    def start_countdown(self, seconds):
+        """Switch to countdown mode and start counting down"""
+        self.cancel()
+        self.kind = 'countdown'
+        self.duration = float(seconds)
+        self.elapsed = 0.0
+        self._changed()
+        self.resume()
+    
+    def resume(self):
+        if self.running or not self.active:
+            return
+        self.running = True
+        self.started = time.perf_counter()
+        self.hz = self.target_hz
+        self.last_units = None
+        self.deadline = time.perf_counter()
+        self._frame()
+    
+    def pause(self):
+        if not self.running:
+            return
+        self.elapsed += time.perf_counter() - self.started
+        self.running = False
+        self.cancel()
+        self._render(time.perf_counter())
+    
+    def toggle(self):
+        if self.running:
+            self.pause()
+        else:
+            self.resume()
+    
+    def reset(self):
+        if not self.active:
+            return
+        self.elapsed = 0.0
+        self.started = time.perf_counter()
+        self.last_units = None
+        self._render(time.perf_counter())
+    
+    def off(self):
+        """Leave stopwatch mode"""
+        self.cancel()
+        self.running = False
+        self.kind = None
+        self._changed()
+    
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+    
+    def cancel(self):
+        if self.after_id is not None:
+            try:
+                self.root.after_cancel(self.after_id)
+            except tk.TclError:
+                pass
+            self.after_id = None
+    
+    def set_rate(self, hz):
+        self.target_hz = self.hz = hz
+    
+    def set_visible(self, visible):
+        """Stop drawing frames while the face is hidden; render once when shown again"""
+        if visible == self.visible:
+            return
+        self.visible = visible
+        self.cancel()
+        if not self.active:
+            return
+        if not visible:
+            self._wait_hidden()
+        elif self.running:
+            self.last_units = None
+            self.deadline = time.perf_counter()
+            self._frame()
+        else:
+            self.last_units = None
+            self._render(time.perf_counter())
+    
+    def _wait_hidden(self):
+        # A hidden countdown only wakes up once, to finish
+        if not self.running or self.kind != 'countdown':
+            return
+        remaining = self.duration - self.elapsed - (time.perf_counter() - self.started)
+        self.after_id = self.root.after(max(1, math.ceil(remaining * 1000)), self._frame)
+    
+    def _frame(self):
+        self.after_id = None
+        t0 = time.perf_counter()
+        self.frames += 1
+        self._render(t0)
+        cost = time.perf_counter() - t0
+        self.frame_time.record(cost)
+        
+        period = 1 / self.hz
+        if cost > period * self.BUDGET_FRACTION:
+            self.over_budget += 1
+            self.consecutive_over += 1
+            slower = [rate for rate in self.RATES if rate < self.hz]
+            if self.consecutive_over >= self.OVER_BUDGET_FRAMES and slower:
+                self.hz = slower[0]
+                self.rate_drops += 1
+                self.consecutive_over = 0
+                period = 1 / self.hz
+        else:
+            self.consecutive_over = 0
+        
+        if not self.running:
+            return
+        if not self.visible:
+            self._wait_hidden()
+            return
+        
+        self.deadline += period
+        now = time.perf_counter()
+        if now > self.deadline:
+            missed = int((now - self.deadline) / period) + 1
+            self.skipped_frames += missed
+            self.deadline += missed * period
+        self.after_id = self.root.after(max(1, round((self.deadline - now) * 1000)), self._frame)
+    
+    def _render(self, now):
+        value = self.elapsed + (now - self.started if self.running else 0.0)
+        scale = 10 ** self.precision
+        if self.kind == 'countdown':
+            value = max(0.0, self.duration - value)
+            # Round up so 00.00 only shows once the countdown is really over
+            units = math.ceil(value * scale)
+        else:
+            units = int(value * scale)
+        
+        if units != self.last_units:
+            self.last_units = units
+            self.render(self.format(units))
+        
+        if self.kind == 'countdown' and value <= 0 and self.running:
+            self.running = False
+            self.elapsed = self.duration
+            if self.on_finish:
+                self.on_finish()
+    
+    def longest_text(self):
+        """Text with the most characters this run can show; None outside stopwatch mode"""
+        if self.kind == 'countdown':
+            return self.format(math.ceil(self.duration * 10 ** self.precision))
+        if self.kind == 'stopwatch':
+            return self.format(9 * 3600 * 10 ** self.precision)
+        return None
+    
+    def format(self, units):
+        """MM:SS.ff (or H:MM:SS.ff) from whole tenths/hundredths"""
+        scale = 10 ** self.precision
+        whole, fraction = divmod(units, scale)
+        minutes, seconds = divmod(whole, 60)
+        hours, minutes = divmod(minutes, 60)
+        fraction_text = self.TWO_DIGITS[fraction] if self.precision == 2 else str(fraction)
+        if hours:
+            return f'{hours}:{self.TWO_DIGITS[minutes]}:{self.TWO_DIGITS[seconds]}.{fraction_text}'
+        return f'{self.TWO_DIGITS[minutes]}:{self.TWO_DIGITS[seconds]}.{fraction_text}'
+    
+    def stats(self):
+        return {
+            'mode': self.kind,
+            'running': self.running,
+            'hz': self.hz,
+            'target_hz': self.target_hz,
+            'frames': self.frames,
+            'skipped_frames': self.skipped_frames,
+            'over_budget_frames': self.over_budget,
+            'rate_drops': self.rate_drops,
+            'frame_time': self.frame_time.summary()
+        }
+
+
+def ease_out_table(frames):
+    """Ease-out cubic progress for each frame, ending at exactly 1.0"""
+    return tuple(1 - (1 - i / frames) ** 3 for i in range(1, frames + 1))
+
+
+class FadeAnimation:
+    """Fade a window's alpha along a precomputed easing table
+    
+    At most one step is pending at any time. Each step picks its easing frame
+    from elapsed time, so a late step skips ahead instead of slowing the fade.
+    Nothing is scheduled once a fade completes or is cancelled.
+    """
+    
+    FRAME_MS = 16
+    DURATION_MS = 180
+    FRAMES = DURATION_MS // FRAME_MS
+    EASING = ease_out_table(FRAMES)
+    
+    def __init__(self, root, window, opacity):
+        self.root = root
+        self.window = window
+        self.opacity = opacity
+        self.alpha = opacity
+        self.after_id = None
+        self.on_done = None
+        self.start_alpha = opacity
+        self.target = opacity
+        self.t0 = 0.0
+        self.index = -1
+        self.fades = 0
+        self.frames = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.set_alpha(opacity)
+    
+    def set_alpha(self, alpha):
+        self.alpha = alpha
+        self.window.attributes('-alpha', alpha)
+    
+    def set_opacity(self, opacity):
+        """Change the resting opacity; applied now unless a fade is running"""
+        self.opacity = opacity
+        if self.after_id is None and self.alpha > 0:
+            self.set_alpha(opacity)
+    
+    def fade(self, visible, on_done=None):
+        """Fade to the resting opacity or to 0, continuing from the current alpha"""
+        self.cancel()
+        self.start_alpha = self.alpha
+        self.target = self.opacity if visible else 0.0
+        self.on_done = on_done
+        self.t0 = time.monotonic()
+        self.index = -1
+        self.fades += 1
+        self.step()
+    
+    def step(self):
+        self.after_id = None
+        index = min(self.FRAMES - 1, int((time.monotonic() - self.t0) * 1000 / self.FRAME_MS))
+        self.skipped += max(0, index - self.index - 1)
+        self.index = index
+        self.frames += 1
+        self.set_alpha(self.start_alpha + (self.target - self.start_alpha) * self.EASING[index])
+        if index < self.FRAMES - 1:
+            self.after_id = self.root.after(self.FRAME_MS, self.step)
+            return
+        on_done, self.on_done = self.on_done, None
+        if on_done:
+            on_done()
+    
+    def cancel(self):
+        """Stop a running fade where it is; its completion callback is dropped"""
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+            self.cancelled += 1
+        self.on_done = None
+    
+    def stats(self):
+        return {
+            'opacity': self.opacity,
+            'fades': self.fades,
+            'frames': self.frames,
+            'skipped_frames': self.skipped,
+            'cancelled': self.cancelled
+        }
+
+
+class TickStats(LatencyStats):
+    """Lateness and jitter statistics for scheduled ticks"""
+    
+    def reset(self):
+        super().reset()
+        self.skipped = 0
+        self.doubled = 0
+    
+    def record(self, lateness, slot_step=1):
+        """Record one tick's lateness (seconds) and how many slots it advanced"""
+        super().record(lateness)
+        if slot_step == 0:
+            self.doubled += 1
+        elif slot_step > 1:
+            self.skipped += slot_step - 1
+    
+    def summary(self):
+        result = super().summary()
+        result['runtime_s'] = round(time.monotonic() - self.started, 3)
+        result['skipped_slots'] = self.skipped
+        result['doubled_slots'] = self.doubled
+        return result
+
+
+class TickScheduler:
+    """Drift-free tick loop aligned to wall-clock boundaries"""
+    
+    BOUNDARY_MARGIN = TICK_BOUNDARY_MARGIN
+    
+    def __init__(self, root, callback, clock=time.time):
+        self.root = root
+        self.callback = callback
+        self.clock = clock
+        self.period = 1.0
+        self.after_id = None
+        self.deadline = None
+        self.last_slot = None
+        self.stats = TickStats()
+    
+    def start(self, period=None):
+        """Tick immediately, then on every following period boundary"""
+        if period is not None:
+            self.period = period
+        self.cancel()
+        self._fire()
+    
+    def cancel(self):
+        """Stop the pending tick, if any"""
+        if self.after_id is not None:
+            try:
+                self.root.after_cancel(self.after_id)
+            except tk.TclError:
+                pass
+            self.after_id = None
+        self.deadline = None
+        self.last_slot = None
+    
+    def _fire(self):
+        self.after_id = None
+        slot = int(self.clock() // self.period)
+        if self.deadline is not None:
+            self.stats.record(time.monotonic() - self.deadline, slot - self.last_slot)
+        self.last_slot = slot
+        
+        try:
+            self.callback()
+        finally:
+            # A failing callback must not end the tick chain
+            self._schedule_next()
+    
+    def _schedule_next(self):
+        # Delay comes from wall time, lateness is measured on the monotonic clock
+        delay = self.period - (self.clock() % self.period) + self.BOUNDARY_MARGIN
+        self.deadline = time.monotonic() + delay
+        self.after_id = self.root.after(max(1, math.ceil(delay * 1000)), self._fire)
+
+
+class CommandQueue:
+    """Bounded queue of calls posted from other threads and run on the Tk thread
+    
+    Posting wakes the Tk loop right away: through a pipe watched by a Tk
+    file handler where Tk supports those, otherwise (Windows) by generating
+    a virtual event from the posting thread, which threaded Tcl hands to
+    the Tk thread. A timer every safety_poll_ms catches anything a wakeup
+    missed. Only when neither wakeup works (Tcl without threads) does it
+    poll: poll_ms right after a command ran, doubling up to idle_poll_ms.
+    """
+    
+    EVENT = '<<CommandQueued>>'
+    
+    def __init__(self, root, maxsize=256, poll_ms=50, idle_poll_ms=1000, safety_poll_ms=30000, batch=64):
+        self.root = root
+        self.queue = queue.Queue(maxsize)
+        self.batch = batch
+        self.lock = threading.Lock()
+        self.closed = False
+        self.after_id = None
+        self.executed = 0
+        self.dropped = 0
+        self.polls = 0
+        self.missed_wakeups = 0
+        self.wakeup_missed = False
+        self.latency = LatencyStats()
+        
+        self.wake_r = self.wake_w = None
+        self.event_wakeup = False
+        self.min_poll_ms = poll_ms
+        self.safety_poll_ms = safety_poll_ms
+        self.max_poll_ms = safety_poll_ms
+        try:
+            self.wake_r, self.wake_w = os.pipe()
+            os.set_blocking(self.wake_r, False)
+            os.set_blocking(self.wake_w, False)
+            root.tk.createfilehandler(self.wake_r, tk.READABLE, self._on_wakeup)
+        except (AttributeError, OSError, tk.TclError):
+            # No file handlers (e.g. Windows)
+            self._close_pipe()
+            if root.tk.eval('info exists tcl_platform(threaded)') == '1':
+                root.bind(self.EVENT, self._on_event, add='+')
+                self.event_wakeup = True
+            else:
+                self.max_poll_ms = idle_poll_ms
+        # Start short so calls posted before the loop runs are not kept waiting
+        self.poll_ms = self.min_poll_ms
+        
+        self.after_id = self.root.after(self.poll_ms, self._poll)
+    
+    def post(self, func, *args):
+        """Queue func(*args) for the Tk thread; safe from any thread, False if dropped"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait((time.perf_counter(), func, args))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        
+        if self.wake_w is not None:
+            try:
+                os.write(self.wake_w, b'\0')
+            except OSError:
+                # Pipe full (a wakeup is already pending) or closed
+                pass
+        elif self.event_wakeup:
+            try:
+                self.root.event_generate(self.EVENT, when='tail')
+            except (RuntimeError, tk.TclError):
+                # The loop is not running yet (or is shutting down); poll soon instead
+                with self.lock:
+                    self.missed_wakeups += 1
+                    self.wakeup_missed = True
+        return True
+    
+    def drain(self):
+        """Run up to one batch of queued calls (Tk thread)"""
+        for _ in range(self.batch):
+            if self.closed:
+                return
+            try:
+                queued, func, args = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.latency.record(time.perf_counter() - queued)
+            self.executed += 1
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error running {getattr(func, '__name__', func)}: {e}")
+        
+        # More left: continue shortly without starving the event loop
+        if not self.closed and not self.queue.empty():
+            self.root.after(1, self.drain)
+    
+    def stats(self):
+        with self.lock:
+            dropped = self.dropped
+            missed = self.missed_wakeups
+        result = self.latency.summary()
+        result.update({
+            'executed': self.executed,
+            'dropped': dropped,
+            'pending': self.queue.qsize(),
+            'wakeup': 'pipe' if self.wake_r is not None else 'event' if self.event_wakeup else 'poll',
+            'missed_wakeups': missed,
+            'poll_ms': self.poll_ms
+        })
+        return result
+    
+    def close(self):
+        """Stop draining (Tk thread); later posts are dropped"""
+        self.closed = True
+        if self.after_id is not None:
+            try:
+                self.root.after_cancel(self.after_id)
+            except tk.TclError:
+                pass
+            self.after_id = None
+        if self.wake_r is not None:
+            try:
+                self.root.tk.deletefilehandler(self.wake_r)
+            except (AttributeError, tk.TclError):
+                pass
+        self._close_pipe()
+    
+    def _on_wakeup(self, fd, mask):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except OSError:
+            pass
+        self.drain()
+    
+    def _on_event(self, event):
+        self.drain()
+    
+    def _poll(self):
+        self.after_id = None
+        self.polls += 1
+        executed = self.executed
+        self.drain()
+        with self.lock:
+            missed = self.wakeup_missed
+            self.wakeup_missed = False
+        if missed or (self.executed != executed and not self.event_wakeup and self.wake_r is None):
+            # Commands are only arriving through the poll: come back soon
+            self.poll_ms = self.min_poll_ms
+        else:
+            self.poll_ms = min(self.poll_ms * 2, self.max_poll_ms)
+        if not self.closed:
+            self.after_id = self.root.after(self.poll_ms, self._poll)
+    
+    def _close_pipe(self):
+        for fd in (self.wake_r, self.wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.wake_r = self.wake_w = None
+
+
+class StallWatchdog:
+    """Detects Tk event loop stalls and captures the main thread's stack
+    
+    The Tk loop posts a heartbeat every half threshold; a watcher thread
+    flags the loop as stalled once a heartbeat is overdue by more than the
+    threshold, and the stall's full duration is recorded when the loop
+    comes back. Reports are appended to log_path as well as printed.
+    """
+    
+    MAX_RECENT = 20
+    
+    def __init__(self, root, threshold_ms=500, log_path=None):
+        self.root = root
+        self.log_path = log_path
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = max(20, threshold_ms // 2)
+        self.interval = self.interval_ms / 1000
+        self.main_ident = threading.get_ident()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.after_id = None
+        self.beats = 0
+        self.last_beat = time.monotonic()
+        self.current = None
+        self.recent = []
+        self.by_cause = {}
+        self.durations = LatencyStats()
+        self.thread = threading.Thread(target=self._watch, name='stall-watchdog', daemon=True)
+    
+    def start(self):
+        self._beat()
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.after_id is not None:
+            try:
+                self.root.after_cancel(self.after_id)
+            except tk.TclError:
+                pass
+            self.after_id = None
+    
+    def _beat(self):
+        self.beats += 1
+        now = time.monotonic()
+        with self.lock:
+            stall = self.current
+            self.current = None
+            gap = now - self.last_beat - self.interval
+            self.last_beat = now
+        if stall is not None:
+            self._finish_stall(stall, gap)
+        if not self.stop_event.is_set():
+            self.after_id = self.root.after(self.interval_ms, self._beat)
+    
+    def _watch(self):
+        while not self.stop_event.wait(self.interval / 2):
+            with self.lock:
+                last_beat = self.last_beat
+                overdue = time.monotonic() - last_beat - self.interval
+                if overdue <= self.threshold or self.current is not None:
+                    continue
+                frame = sys._current_frames().get(self.main_ident)
+            # Formatting reads source files; keep it outside the lock _beat needs
+            stack = traceback.format_stack(frame) if frame is not None else []
+            stall = {'cause': self._cause(frame), 'stack': stack}
+            del frame
+            with self.lock:
+                recovered = self.last_beat != last_beat
+                if not recovered:
+                    self.current = stall
+                gap = self.last_beat - last_beat - self.interval
+            self.log(f"Event loop stalled for over {overdue * 1000:.0f} ms in {stall['cause']}:\n{''.join(stack)}")
+            if recovered:
+                # The loop came back while the stack was being formatted
+                self._finish_stall(stall, gap)
+    
+    @staticmethod
+    def _cause(frame):
+        """Innermost frame in this file, else the innermost frame overall"""
+        innermost = frame
+        while frame is not None:
+            if frame.f_code.co_filename == __file__:
+                break
+            frame = frame.f_back
+        frame = frame or innermost
+        if frame is None:
+            return 'unknown'
+        return f'{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})'
+    
+    def log(self, message):
+        """Print a report and append it to log_path; either may be unavailable"""
+        if sys.stdout is not None:
+            print(message, flush=True)
+        if self.log_path is None:
+            return
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f"{datetime.now().isoformat(timespec='seconds')} {message}\n")
+        except OSError:
+            pass
+    
+    def _finish_stall(self, stall, duration):
+        cause = stall['cause']
+        self.log(f"Event loop stalled for {duration * 1000:.0f} ms in {cause}")
+        with self.lock:
+            self.durations.record(duration)
+            count, total, longest = self.by_cause.get(cause, (0, 0.0, 0.0))
+            self.by_cause[cause] = (count + 1, total + duration, max(longest, duration))
+            self.recent.append({'cause': cause, 'duration_ms': round(duration * 1000, 1), 'stack': stall['stack']})
+            del self.recent[:-self.MAX_RECENT]
+    
+    def summary(self):
+        with self.lock:
+            return {
+                'threshold_ms': round(self.threshold * 1000),
+                'durations': self.durations.summary(),
+                'by_cause': {
+                    cause: {'count': count, 'total_ms': round(total * 1000, 1), 'max_ms': round(longest * 1000, 1)}
+                    for cause, (count, total, longest) in sorted(self.by_cause.items(), key=lambda kv: -kv[1][1])
+                },
+                'recent': list(self.recent)
+            }
+
+
+class FontMetricsCache:
+    """Measured clock text extents, cached per font and format settings"""
+    
+    def __init__(self, root):
+        self.root = root
+        self.fonts = {}
+        self.extents = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def font(self, family, size, weight='normal'):
+        key = (family, size, weight)
+        font = self.fonts.get(key)
+        if font is None:
+            font = tkfont.Font(root=self.root, family=family, size=size, weight=weight)
+            self.fonts[key] = font
+        return font
+    
+    @staticmethod
+    def widest(font, candidates):
+        return max(candidates, key=font.measure, default='')
+    
+    def clock_extent(self, family, size, time_format, show_seconds, show_date, stopwatch_text=None):
+        """(width, height) in pixels of the widest text the clock face can show
+        
+        stopwatch_text is a sample stopwatch/countdown face; its digits are
+        measured as the widest digit so the running stopwatch never clips.
+        """
+        if stopwatch_text is not None:
+            stopwatch_text = re.sub(r'\d', '0', stopwatch_text)
+        key = (family, size, time_format, show_seconds, show_date, stopwatch_text)
+        extent = self.extents.get(key)
+        if extent is not None:
+            self.hits += 1
+            return extent
+        self.misses += 1
+        
+        font = self.font(family, size, 'bold')
+        digits = self.widest(font, '0123456789') * 2
+        time_text = f'{digits}:{digits}' + (f':{digits}' if show_seconds else '')
+        if time_format == '12h':
+            time_text += self.widest(font, [datetime(2000, 1, 1, h).strftime(' %p') for h in (0, 12)])
+        lines = [time_text]
+        if show_date:
+            weekdays = [datetime(2024, 1, d).strftime('%a') for d in range(1, 8)]
+            months = [datetime(2024, m, 1).strftime('%b') for m in range(1, 13)]
+            lines.insert(0, f'{self.widest(font, weekdays)}, {self.widest(font, months)} {digits}')
+        
+        width = max(font.measure(line) for line in lines)
+        if stopwatch_text is not None:
+            width = max(width, font.measure(stopwatch_text.replace('0', digits[0])))
+        extent = (width, font.metrics('linespace') * len(lines))
+        self.extents[key] = extent
+        return extent
+    
+    def stats(self):
+        return {'fonts': len(self.fonts), 'extents': len(self.extents), 'hits': self.hits, 'misses': self.misses}
+    
+    def text_extent(self, family, size, texts):
+        """(width, total height) of several single-line texts in a regular-weight font"""
+        font = self.font(family, size)
+        return max((font.measure(text) for text in texts), default=0), font.metrics('linespace') * len(texts)
+
+
+class LabelRenderer:
+    """Clock face drawn as the text of a single tk.Label"""
+    
+    def __init__(self, parent, font, color, bg_color):
+        self.widget = tk.Label(
+            parent,
+            font=font,
+            bg=bg_color,
+            fg=color,
+            padx=10,
+            pady=5
+        )
+        self.render_time = LatencyStats()
+    
+    def show(self, text):
+        t0 = time.perf_counter_ns()
+        self.widget.config(text=text)
+        self.render_time.record((time.perf_counter_ns() - t0) / 1e9)
+    
+    def set_font(self, font):
+        self.widget.config(font=font)
+    
+    def set_color(self, color):
+        self.widget.config(fg=color)
+    
+    def stats(self):
+        return {
+            'renderer': 'label',
+            'render_time': self.render_time.summary()
+        }
+
+
+class GlyphCache:
+    """Pre-rendered glyph images for one (font, size, color) key"""
+    
+    PREWARM = '0123456789: APM'
+    
+    # Font files tried for each clock face family before PIL's default font
+    FONT_FILES = {
+        'Segoe UI': ('segoeuib.ttf', 'seguisb.ttf', 'segoeui.ttf'),
+        'SF Pro Display': (
+            'SF-Pro-Display-Bold.otf',
+            '/Library/Fonts/SF-Pro-Display-Bold.otf',
+            '/System/Library/Fonts/SFNS.ttf'
+        )
+    }
+    
+    def __init__(self, pixels_per_point):
+        self.pixels_per_point = pixels_per_point
+        self.key = None
+        self.font = None
+        self.glyphs = {}
+        self.widths = {}
+        self.digit_width = 0
+        self.line_height = 0
+    
+    def configure(self, family, size, color):
+        """Switch to a new key, dropping glyphs of the old one; returns True if changed"""
+        key = (family, size, color)
+        if key == self.key:
+            return False
+        
+        self.key = key
+        self.glyphs = {}
+        self.widths = {}
+        self.font = self.load_font(family, max(1, round(size * self.pixels_per_point)))
+        ascent, descent = self.font.getmetrics()
+        self.line_height = ascent + descent
+        # Tabular digits keep cell positions stable while the time changes
+        self.digit_width = max(math.ceil(self.font.getlength(d)) for d in '0123456789')
+        for ch in self.PREWARM:
+            self.get(ch)
+        return True
+    
+    @classmethod
+    def load_font(cls, family, size_px):
+        from PIL import ImageFont
+        
+        for name in cls.FONT_FILES.get(family, ()):
+            try:
+                return ImageFont.truetype(name, size_px)
+            except OSError:
+                continue
+        try:
+            return ImageFont.load_default(size_px)
+        except TypeError:
+            return ImageFont.load_default()
+    
+    def width(self, ch):
+        width = self.widths.get(ch)
+        if width is None:
+            if ch.isdigit():
+                width = self.digit_width
+            else:
+                width = max(1, math.ceil(self.font.getlength(ch)))
+            self.widths[ch] = width
+        return width
+    
+    def get(self, ch):
+        """Return the PhotoImage for a character, rendering it on first use"""
+        image = self.glyphs.get(ch)
+        if image is None:
+            from PIL import Image, ImageDraw, ImageTk
+            
+            width = self.width(ch)
+            glyph = Image.new('RGBA', (width, self.line_height), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(glyph)
+            x = (width - self.font.getlength(ch)) / 2
+            draw.text((x, 0), ch, font=self.font, fill=self.key[2])
+            image = ImageTk.PhotoImage(glyph)
+            self.glyphs[ch] = image
+        return image
+
+
+def draw_tray_icon():
+    """Draw the static tray icon"""
+    from PIL import Image, ImageDraw
+    
+    icon_image = Image.new('RGBA', (64, 64), color=(0, 0, 0, 0))
+    draw = ImageDraw.Draw(icon_image)
+    
+    # Clock circle
+    draw.ellipse([12, 12, 52, 52], fill='#0066ff', outline='#0066ff')
+    draw.ellipse([16, 16, 48, 48], fill='white', outline='white')
+    
+    # Clock hands
+    draw.rectangle([30, 18, 34, 32], fill='#0066ff')
+    draw.rectangle([30, 32, 42, 34], fill='#0066ff')
+    
+    # Center dot
+    draw.ellipse([30, 30, 34, 34], fill='#0066ff')
+    
+    return icon_image
+
+
+class TrayFaceAtlas:
+    """Live tray icon faces for every minute of a 12 or 24 hour cycle
+    
+    Faces are cut from one prerendered sprite sheet (one row per hour, one
+    column per minute), loaded from a PNG cache or built once on a background
+    thread. Until the sheet is ready, faces are drawn on demand. The last few
+    faces are kept in a small LRU so repeated lookups are free.
+    """
+    
+    STYLES = TRAY_STYLES
+    SIZE = 48
+    SUPERSAMPLE = 4
+    LRU_SIZE = 4
+    ACCENT = '#0066ff'
+    FACE = '#ffffff'
+    
+    def __init__(self, style, time_format, cache_dir, family):
+        self.style = style
+        self.time_format = time_format
+        self.family = family
+        self.hours = 24 if style == 'digital' and time_format == '24h' else 12
+        self.cache_path = os.path.join(
+            cache_dir,
+            f'.transparent_clock_tray_{style}_{self.hours}h_v{TRAY_ICON_VERSION}.png'
+        )
+        self.sheet = None
+        self.sheet_source = None
+        self.sheet_build_s = None
+        self.font = None
+        self.recent = collections.OrderedDict()
+        self.hits = 0
+        self.cut = 0
+        self.drawn = 0
+        self.draw_time = LatencyStats()
+    
+    def load_sheet(self):
+        """Load the sprite sheet from its PNG cache, building and caching it if missing"""
+        from PIL import Image
+        
+        width, height = 60 * self.SIZE, self.hours * self.SIZE
+        try:
+            sheet = Image.open(self.cache_path)
+            sheet.load()
+            if sheet.size == (width, height):
+                self.sheet_source = 'cache'
+                self.sheet = sheet.convert('RGBA')
+                return
+        except (OSError, ValueError):
+            pass
+        
+        t0 = time.perf_counter()
+        sheet = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        for hour in range(self.hours):
+            for minute in range(60):
+                sheet.paste(self.draw(hour, minute), (minute * self.SIZE, hour * self.SIZE))
+        self.sheet_build_s = round(time.perf_counter() - t0, 3)
+        try:
+            sheet.save(self.cache_path, 'PNG')
+        except OSError as e:
+            print(f"Error caching tray icon sheet: {e}")
+        self.sheet_source = 'built'
+        self.sheet = sheet
+    
+    def start_loading(self):
+        threading.Thread(target=self.load_sheet, name='tray-sheet', daemon=True).start()
+    
+    def frame(self, now):
+        """Return the face image for the minute containing now"""
+        key = (now.hour % self.hours, now.minute)
+        image = self.recent.get(key)
+        if image is not None:
+            self.recent.move_to_end(key)
+            self.hits += 1
+            return image
+        
+        sheet = self.sheet
+        if sheet is not None:
+            x, y = key[1] * self.SIZE, key[0] * self.SIZE
+            image = sheet.crop((x, y, x + self.SIZE, y + self.SIZE))
+            self.cut += 1
+        else:
+            t0 = time.perf_counter_ns()
+            image = self.draw(*key)
+            self.draw_time.record((time.perf_counter_ns() - t0) / 1e9)
+        self.recent[key] = image
+        if len(self.recent) > self.LRU_SIZE:
+            self.recent.popitem(last=False)
+        return image
+    
+    def draw(self, hour, minute):
+        """Draw one face, supersampled for smooth hands and text"""
+        from PIL import Image, ImageDraw
+        
+        self.drawn += 1
+        size = self.SIZE * self.SUPERSAMPLE
+        image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        
+        if self.style == 'analog':
+            center = size / 2
+            draw.ellipse([0, 0, size - 1, size - 1], fill=self.ACCENT)
+            inset = size * 0.08
+            draw.ellipse([inset, inset, size - 1 - inset, size - 1 - inset], fill=self.FACE)
+            
+            hands = (
+                ((hour % 12) * 30 + minute * 0.5, size * 0.24, size * 0.09),
+                (minute * 6, size * 0.36, size * 0.06)
+            )
+            for degrees, length, width in hands:
+                angle = math.radians(degrees)
+                tip = (center + length * math.sin(angle), center - length * math.cos(angle))
+                draw.line([(center, center), tip], fill=self.ACCENT, width=round(width))
+            dot = size * 0.06
+            draw.ellipse([center - dot, center - dot, center + dot, center + dot], fill=self.ACCENT)
+        else:
+            if self.font is None:
+                self.font = GlyphCache.load_font(self.family, round(size * 0.44))
+            draw.rounded_rectangle([0, 0, size - 1, size - 1], radius=size * 0.18, fill=self.ACCENT)
+            shown_hour = hour if self.hours == 24 else (hour % 12 or 12)
+            for line, text in enumerate((f'{shown_hour:02d}', f'{minute:02d}')):
+                # Center each line from its bounding box (bitmap fallback
+                # fonts do not support text anchors)
+                left, top, right, bottom = draw.textbbox((0, 0), text, font=self.font)
+                x = (size - (right - left)) / 2 - left
+                y = size * (0.29 + 0.44 * line) - (top + bottom) / 2
+                draw.text((x, y), text, font=self.font, fill=self.FACE)
+        
+        return image.resize((self.SIZE, self.SIZE), Image.LANCZOS)
+    
+    def stats(self):
+        return {
+            'style': self.style,
+            'sheet': self.sheet_source,
+            'sheet_build_s': self.sheet_build_s,
+            'lru_hits': self.hits,
+            'cut_from_sheet': self.cut,
+            'drawn': self.drawn,
+            'draw_time': self.draw_time.summary()
+        }
+
+
+class CanvasGlyphRenderer:
+    """Clock face drawn on a Canvas from cached glyph images, one item per cell"""
+    
+    PADX = 10
+    PADY = 5
+    
+    def __init__(self, parent, font, color, bg_color):
+        self.widget = tk.Canvas(
+            parent,
+            bg=bg_color,
+            highlightthickness=0,
+            borderwidth=0,
+            width=1,
+            height=1
+        )
+        self.family = font.cget('family')
+        self.size = font.cget('size')
+        self.color = self.hex_color(color)
+        self.cache = GlyphCache(self.widget.winfo_fpixels('1p'))
+        self.text = None
+        self.layout = None
+        self.cells = ''
+        self.items = []
+        
+        self.render_time = LatencyStats()
+        self.full_layouts = 0
+        self.cells_replaced = 0
+    
+    def show(self, text):
+        t0 = time.perf_counter_ns()
+        cache = self.cache
+        cache.configure(self.family, self.size, self.color)
+        lines = text.split('\n')
+        layout = tuple(tuple(cache.width(ch) for ch in line) for line in lines)
+        
+        if layout != self.layout:
+            self._relayout(lines, layout)
+        else:
+            cells = ''.join(lines)
+            for i, (old, new) in enumerate(zip(self.cells, cells)):
+                if old != new:
+                    self.widget.itemconfig(self.items[i], image=cache.get(new))
+                    self.cells_replaced += 1
+            self.cells = cells
+        
+        self.text = text
+        self.render_time.record((time.perf_counter_ns() - t0) / 1e9)
+    
+    def _relayout(self, lines, layout):
+        cache = self.cache
+        self.widget.delete('all')
+        self.items = []
+        
+        content_width = max(sum(widths) for widths in layout)
+        for row, (line, widths) in enumerate(zip(lines, layout)):
+            # Center each line like a multi-line Label does
+            x = self.PADX + (content_width - sum(widths)) // 2
+            y = self.PADY + row * cache.line_height
+            for ch, width in zip(line, widths):
+                self.items.append(self.widget.create_image(x, y, image=cache.get(ch), anchor='nw'))
+                x += width
+        
+        self.widget.config(
+            width=content_width + 2 * self.PADX,
+            height=len(lines) * cache.line_height + 2 * self.PADY
+        )
+        self.layout = layout
+        self.cells = ''.join(lines)
+        self.full_layouts += 1
+        self.cells_replaced += len(self.cells)
+    
+    def invalidate(self):
+        """Force a full re-render from the glyph cache"""
+        self.layout = None
+        if self.text is not None:
+            self.show(self.text)
+    
+    def set_font(self, font):
+        self.family = font.cget('family')
+        self.size = font.cget('size')
+        self.invalidate()
+    
+    def hex_color(self, color):
+        """#rrggbb for any Tk color; PIL does not know Tk names like 'SystemButtonFace'"""
+        r, g, b = self.widget.winfo_rgb(color)
+        return f'#{r >> 8:02x}{g >> 8:02x}{b >> 8:02x}'
+    
+    def set_color(self, color):
+        self.color = self.hex_color(color)
+        self.invalidate()
+    
+    def stats(self):
+        return {
+            'renderer': 'canvas',
+            'render_time': self.render_time.summary(),
+            'full_layouts': self.full_layouts,
+            'cells_replaced': self.cells_replaced,
+            'cached_glyphs': len(self.cache.glyphs)
+        }
+
+
+RENDERERS = {
+    'label': LabelRenderer,
+    'canvas': CanvasGlyphRenderer
+}
+
+
+class InstanceRunning(OSError):
+    """Another instance of this user holds the lock file"""
+
+
+def acquire_lock(path):
+    """Open and exclusively lock a per-user lock file; raises InstanceRunning if held
+    
+    The OS drops the lock when the process exits, even after a crash, so a
+    stale file never blocks the next start.
+    """
+    lock = open(path, 'a+b')
+    try:
+        if sys.platform == 'win32':
+            import msvcrt
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError as e:
+        lock.close()
+        raise InstanceRunning(e.errno, f'{path} is locked by another instance') from e
+    return lock
+
+
+class InstanceServer:
+    """Local socket that makes this process the single running instance
+    
+    A per-user lock file decides which process is the instance; it then
+    listens on an ephemeral port advertised in IPC_FILE, where later
+    launches find the port and token and forward one JSON command per
+    connection instead of starting a second clock.
+    """
+    
+    def __init__(self, path=IPC_FILE, lock_path=LOCK_FILE):
+        self.path = path
+        self.token = secrets.token_hex(16)
+        self.handler = None
+        self.closed = False
+        self.lock = acquire_lock(lock_path)
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.bind(('127.0.0.1', 0))
+            self.sock.listen(8)
+            self.port = self.sock.getsockname()[1]
+            self._write_file()
+        except OSError:
+            self.lock.close()
+            raise
+    
+    def _write_file(self):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.transparent_clock_', suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'port': self.port, 'token': self.token, 'pid': os.getpid()}, f)
+        os.replace(tmp_path, self.path)
+    
+    def start(self, handler):
+        """Start serving; handler(command, args) runs on the server thread"""
+        self.handler = handler
+        thread = threading.Thread(target=self._serve, name='instance-server', daemon=True)
+        thread.start()
+    
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        try:
+            with open(self.path) as f:
+                if json.load(f).get('token') == self.token:
+                    os.remove(self.path)
+        except (OSError, ValueError):
+            pass
+        # Closing the file releases the lock for the next instance
+        self.lock.close()
+    
+    def _serve(self):
+        while not self.closed:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                conn.settimeout(1.0)
+                try:
+                    reply = self._handle(_recv_line(conn))
+                except (OSError, ValueError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                try:
+                    conn.sendall(json.dumps(reply).encode() + b'\n')
+                except OSError:
+                    pass
+    
+    def _handle(self, data):
+        message = json.loads(data)
+        if not hmac.compare_digest(str(message.get('token', '')), self.token):
+            return {'ok': False, 'error': 'bad token'}
+        command = message.get('command')
+        args = message.get('args') or []
+        if not isinstance(command, str) or not isinstance(args, list):
+            raise ValueError('malformed command')
+        self.handler(command, [str(a) for a in args])
+        return {'ok': True}
+
+
+def _recv_line(conn):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(IPC_MAX_MESSAGE)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > IPC_MAX_MESSAGE:
+            raise ValueError('message too long')
+    return data.decode()
+
+
+def send_command(command, args=(), path=IPC_FILE, timeout=1.0):
+    """Forward a command to the running instance; returns its reply or None if none runs"""
+    try:
+        with open(path) as f:
+            info = json.load(f)
+        with socket.create_connection(('127.0.0.1', int(info['port'])), timeout=timeout) as conn:
+            message = {'token': info['token'], 'command': command, 'args': list(args)}
+            conn.sendall(json.dumps(message).encode() + b'\n')
+            return json.loads(_recv_line(conn))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def session_idle_seconds(root):
+    """Seconds since the last user input, or None if Tk cannot tell"""
+    try:
+        idle_ms = int(root.tk.call('tk', 'inactive'))
+    except (tk.TclError, ValueError):
+        return None
+    return idle_ms / 1000 if idle_ms >= 0 else None
+
+
+def session_locked():
+    """True if the Windows session is locked; always False elsewhere"""
+    if sys.platform != 'win32':
+        return False
+    try:
+        import ctypes
+        user32 = ctypes.windll.user32
+        # The input desktop can't be opened/switched to while the lock screen is up
+        desktop = user32.OpenInputDesktop(0, False, 0x0100)
+        if not desktop:
+            return True
+        try:
+            return not user32.SwitchDesktop(desktop)
+        finally:
+            user32.CloseDesktop(desktop)
+    except (AttributeError, OSError):
+        return False
+
+
+def monitor_work_areas(root):
+    """Work areas (left, top, right, bottom) of all monitors, primary first; None if unknown"""
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+            
+            class MONITORINFO(ctypes.Structure):
+                _fields_ = [
+                    ('cbSize', wintypes.DWORD),
+                    ('rcMonitor', wintypes.RECT),
+                    ('rcWork', wintypes.RECT),
+                    ('dwFlags', wintypes.DWORD)
+                ]
+            
+            areas = []
+            
+            def add_monitor(monitor, dc, rect, data):
+                info = MONITORINFO()
+                info.cbSize = ctypes.sizeof(MONITORINFO)
+                if ctypes.windll.user32.GetMonitorInfoW(monitor, ctypes.byref(info)):
+                    work = info.rcWork
+                    area = (work.left, work.top, work.right, work.bottom)
+                    # MONITORINFOF_PRIMARY
+                    if info.dwFlags & 1:
+                        areas.insert(0, area)
+                    else:
+                        areas.append(area)
+                return True
+            
+            callback = ctypes.WINFUNCTYPE(
+                wintypes.BOOL, wintypes.HANDLE, wintypes.HDC, ctypes.POINTER(wintypes.RECT), wintypes.LPARAM
+            )(add_monitor)
+            ctypes.windll.user32.EnumDisplayMonitors(None, None, callback, 0)
+            if areas:
+                return areas
+        except (AttributeError, OSError):
+            pass
+    return None
 
 
-class TransparentClock:
-    def __init__(self):
+class MonitorLayout:
+    """Cached monitor work areas; queried again only when refresh() is called"""
+    
+    # Distance in pixels at which a dragged window snaps to a monitor edge
+    SNAP_PX = 12
+    
+    def __init__(self, root):
+        self.root = root
+        self.monitors = []
+        self.per_monitor = False
+        self.refreshes = 0
+        self.refresh()
+    
+    def refresh(self):
+        """Re-query the monitor layout; returns True if it changed"""
+        monitors = monitor_work_areas(self.root)
+        self.per_monitor = monitors is not None
+        if monitors is None:
+            # Tk only knows the main screen (e.g. the main display on macOS)
+            monitors = [(0, 0, self.root.winfo_screenwidth(), self.root.winfo_screenheight())]
+        self.refreshes += 1
+        changed = monitors != self.monitors
+        self.monitors = monitors
+        return changed
+    
+    @property
+    def primary(self):
+        return self.monitors[0]
+    
+    def monitor_at(self, x, y):
+        """Monitor containing a point, or the nearest one"""
+        def distance(area):
+            left, top, right, bottom = area
+            dx = max(left - x, 0, x - right)
+            dy = max(top - y, 0, y - bottom)
+            return dx * dx + dy * dy
+        return min(self.monitors, key=distance)
+    
+    def clamp(self, x, y, width, height):
+        """Move a window rectangle fully onto the monitor nearest its center
+        
+        Without real per-monitor bounds a window on a secondary display would
+        look off screen, so it is left alone.
+        """
+        if not self.per_monitor:
+            return x, y
+        left, top, right, bottom = self.monitor_at(x + width // 2, y + height // 2)
+        x = max(left, min(x, right - width))
+        y = max(top, min(y, bottom - height))
+        return x, y
+    
+    def snap(self, x, y, width, height):
+        """Pull a window rectangle onto monitor edges within SNAP_PX"""
+        left, top, right, bottom = self.monitor_at(x + width // 2, y + height // 2)
+        if abs(x - left) <= self.SNAP_PX:
+            x = left
+        elif abs(x + width - right) <= self.SNAP_PX:
+            x = right - width
+        if abs(y - top) <= self.SNAP_PX:
+            y = top
+        elif abs(y + height - bottom) <= self.SNAP_PX:
+            y = bottom - height
+        return x, y
+    
+    def popup_position(self, width, height, near_x, near_y):
+        """Bottom-right corner of the monitor showing the clock, as popups were placed before"""
+        left, top, right, bottom = self.monitor_at(near_x, near_y)
+        return max(left, right - width - 20), max(top, bottom - height - 60)
+    
+    def stats(self):
+        return {'monitors': self.monitors, 'per_monitor': self.per_monitor, 'refreshes': self.refreshes}
+
+
+def process_rss_bytes():
+    """Resident set size of this process, or None if it can't be read"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+            
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)
+                ]
+            
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        if os.path.exists('/proc/self/statm'):
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        import resource
+        # macOS reports the peak in bytes; it is the closest available figure
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (OSError, ValueError, AttributeError, ImportError):
+        return None
+
+
+class StartupProfiler:
+    """Per-phase startup timings measured from process start"""
+    
+    def __init__(self, t0=_STARTUP_T0):
+        self.t0 = t0
+        self.last = t0
+        self.phases = []
+        self.lock = threading.Lock()
+    
+    def mark(self, phase):
+        """Close the current phase under the given name"""
+        with self.lock:
+            now = time.perf_counter()
+            self.phases.append((phase, now - self.last, now - self.t0))
+            self.last = now
+    
+    def summary(self):
+        with self.lock:
+            return [
+                {'phase': phase, 'ms': round(duration * 1000, 2), 'total_ms': round(total * 1000, 2)}
+                for phase, duration, total in self.phases
+            ]
+
+
+class TransparentClock(ClockModel):
+    # Minimum interval between window moves while dragging (~60 fps)
+    DRAG_FRAME_MS = 16
+    
+    # Border Tk draws around a Label, counted when sizing the window
+    LABEL_BORDER = 2
+    
+    # How often idle/lock state is checked when suspend_when_idle is on
+    IDLE_POLL_MS = 5000
+    
+    # Wait for a burst of Configure events to settle before re-querying monitors
+    LAYOUT_SETTLE_MS = 500
+    
+    # How often the config file is stat'ed for external edits, and how
+    # much slower while ticking is suspended
+    CONFIG_POLL_MS = 2000
+    SUSPENDED_POLL_FACTOR = 15
+    
+    # Settings only read at startup; reloads keep them for the next start
+    RESTART_SETTINGS = ('renderer', 'stall_threshold_ms')
+    
+    # Popup (width, height); they are placed next to the clock on every open
+    POPUP_SIZES = {'format': (320, 260), 'appearance': (320, 560), 'diagnostics': (420, 480)}
+    
+    # Color alternated with the text color when an alarm flashes the clock
+    FLASH_COLOR = '#ff3b30'
+    
+    # Minimum interval between live color previews (~30 fps)
+    COLOR_PREVIEW_MS = 33
+    
+    PALETTE = (
+        '#000000', '#1d1d1f', '#86868b', '#ffffff', '#ff3b30', '#ff9500', '#ffcc00', '#34c759',
+        '#00c7be', '#30b0c7', '#0066ff', '#5856d6', '#af52de', '#ff2d55', '#a2845e', '#8e8e93'
+    )
+    
+    def __init__(self, renderer=None, profiler=None, on_tray_ready=None, instance_server=None,
+                 watchdog_ms=None):
+        self.profiler = profiler or StartupProfiler()
+        self.instance_server = instance_server
+        self.on_tray_ready = on_tray_ready
+        self.tray_icon = None
+        
         # Hidden main window
         self.root = tk.Tk()
         self.root.withdraw()
+        self.monitors = MonitorLayout(self.root)
+        self.profiler.mark('tk_init')
         
-        # Configuration file path
-        self.config_file = os.path.join(os.path.expanduser('~'), '.transparent_clock_config.json')
-        self.load_config()
+        # Settings, config file and face formatting
+        super().__init__(CONFIG_FILE)
+        self.profiler.mark('load_config')
+        if renderer is not None:
+            self.renderer = renderer
+        
+        # Shared fonts and popup colors
+        self.theme = Theme(self.root, self.theme_mode, self.clock_font)
+        self.theme.set_clock_size(self.font_size, self.world_font_size())
         
         # Clock window
         self.clock_window = tk.Toplevel(self.root)
@@ -46,115 +1951,312 @@ class TransparentClock:
             self.bg_color = 'systemTransparent'
         elif system == 'Windows':
             self.clock_window.attributes('-transparentcolor', self.bg_color)
-            self.clock_window.attributes('-alpha', 0.95)
         
         self.clock_window.config(bg=self.bg_color)
-        
-        # Position window
-        self.window_width = max(160, int(self.font_size * 6.5))
-        self.window_height = max(60, int(self.font_size * 2.8))
-        self.clock_window.geometry(
-            f'{self.window_width}x{self.window_height}+{self.x_position}+{self.y_position}'
+        self.fader = FadeAnimation(self.root, self.clock_window, self.opacity)
+        
+        # Stopwatch/countdown face; sized into the window geometry while active
+        self.stopwatch = StopwatchMode(
+            self.root,
+            self.show_stopwatch_text,
+            on_finish=self.on_countdown_finished,
+            on_change=self.update_window_geometry,
+            hz=self.stopwatch_hz,
+            precision=self.stopwatch_precision
         )
         
-        # Time label
-        self.time_label = tk.Label(
+        # Position window
+        self.font_metrics = FontMetricsCache(self.root)
+        self.font_after_id = None
+        self.window_width = None
+        self.window_height = None
+        self.update_window_geometry()
+        
+        # Time label (a Label or glyph Canvas depending on the renderer)
+        self.clock_renderer = RENDERERS[self.renderer](
             self.clock_window,
-            font=('SF Pro Display', self.font_size, 'bold') if system == 'Darwin' else ('Segoe UI', self.font_size, 'bold'),
-            bg=self.bg_color,
-            fg=self.text_color,
-            padx=10,
-            pady=5
+            self.theme.fonts['clock'],
+            self.text_color,
+            self.bg_color
         )
+        self.time_label = self.clock_renderer.widget
         self.time_label.pack()
         
+        # Extra time zone rows, all formatted from the same tick
+        self.world_frame = tk.Frame(self.clock_window, bg=self.bg_color)
+        self.world_frame.pack()
+        self.world_labels = []
+        self.world_texts = []
+        self.build_world_rows()
+        
         # Draggable
+        self.drag_origin = None
+        self.drag_pointer = None
+        self.drag_target = None
+        self.drag_frame_id = None
+        self.drag_stats = {'drags': 0, 'motion_events': 0, 'geometry_calls': 0}
         self.time_label.bind('<Button-1>', self.start_move)
         self.time_label.bind('<B1-Motion>', self.on_move)
         self.time_label.bind('<ButtonRelease-1>', self.end_move)
         
+        # Keep the saved position on a connected monitor, and re-check after
+        # display changes move the window
+        self.layout_after_id = None
+        self.keep_on_screen()
+        self.clock_window.bind('<Configure>', self.on_clock_configure)
+        
         # Context menu
         self.clock_window.bind('<Button-3>', self.show_context_menu)
         self.time_label.bind('<Button-3>', self.show_context_menu)
         
-        # Popup window reference
+        # Popup window reference; popups and the context menu are built on
+        # first use and reused afterwards
         self.popup_window = None
-        
-        # Start updating
-        self.update_time()
-        
-        # Create system tray icon
-        self.create_tray_icon()
-    
-    def load_config(self):
-        """Load saved configuration or use defaults"""
-        default_config = {
-            'font_size': 26,
-            'text_color': '#000000',
-            'time_format': '24h',
-            'show_seconds': True,
-            'show_date': False,
-            'x_position': None,
-            'y_position': 20,
-            'opacity': 0.95
-        }
-        
+        self.popup_opening = None
+        self.popups = {}
+        self.context_menu = None
+        self.popup_latency = {}
+        self.color_preview = None
+        self.color_preview_after = None
+        self.hsv_synced = None
+        
+        # Start updating; ticking is suspended while hidden or idle
+        self.last_time_text = None
+        self.clock_hidden = False
+        self.session_idle = False
+        self.ticks_suspended = False
+        self.idle_after_id = None
+        # Timer callbacks owned by the clock itself, per source
+        self.wakeups = collections.Counter()
+        self.wakeups_started = time.monotonic()
+        self.tick_scheduler = TickScheduler(self.root, self.update_time, clock=self.now)
+        self.tray_ticks = TickScheduler(self.root, self.update_tray_face, clock=self.now)
+        self.tray_atlas = None
+        self.tray_face = None
+        self.restart_ticks()
+        if self.suspend_when_idle:
+            self.idle_after_id = self.root.after(self.IDLE_POLL_MS, self.check_idle)
+        self.clock_window.update_idletasks()
+        self.profiler.mark('first_paint')
+        
+        # Calls from the tray and IPC threads go through this queue
+        self.commands = CommandQueue(self.root)
+        
+        # Alarms, reminders and countdowns wake the loop on their own schedule
+        self.flash_after_id = None
+        self.alarms = AlarmEngine(self.root, self.on_alarm, on_change=self.save_config, clock=self.now)
+        self.alarms.load(self.alarm_entries)
+        
+        # Optional event loop stall detection
+        self.watchdog = None
+        if watchdog_ms is not None:
+            self.stall_threshold_ms = watchdog_ms
+        if self.stall_threshold_ms:
+            self.watchdog = StallWatchdog(self.root, self.stall_threshold_ms, STALL_LOG_FILE)
+            self.watchdog.start()
+        
+        # Optional SNTP offset correction on a background thread
+        self.apply_time_sync()
+        
+        # Pick up edits made to the config file by other tools
+        self.config_reloads = 0
+        self.config_after_id = self.root.after(self.CONFIG_POLL_MS, self.check_config)
+        
+        # Create system tray icon once the clock is on screen
+        self.root.after_idle(self.create_tray_icon)
+        
+        # Accept commands from later launches
+        if self.instance_server:
+            self.instance_server.start(self.handle_remote_command)
+    
+    def default_x_position(self):
+        return self.monitors.primary[2] - 180
+    
+    def valid_color(self, color):
+        """Any color Tk can resolve, hex or a name like 'white'"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    # Merge with defaults
-                    default_config.update(config)
-        except Exception as e:
-            print(f"Error loading config: {e}")
-        
-        self.font_size = default_config['font_size']
-        self.text_color = default_config['text_color']
-        self.time_format = default_config['time_format']
-        self.show_seconds = default_config['show_seconds']
-        self.show_date = default_config['show_date']
-        self.opacity = default_config['opacity']
-        
-        # Calculate x_position if not saved
-        if default_config['x_position'] is None:
-            screen_width = self.root.winfo_screenwidth()
-            self.x_position = screen_width - 180
-        else:
-            self.x_position = default_config['x_position']
-        
-        self.y_position = default_config['y_position']
-    
-    def save_config(self):
-        """Save current configuration"""
-        config = {
-            'font_size': self.font_size,
-            'text_color': self.text_color,
-            'time_format': self.time_format,
-            'show_seconds': self.show_seconds,
-            'show_date': self.show_date,
-            'x_position': self.clock_window.winfo_x(),
-            'y_position': self.clock_window.winfo_y(),
-            'opacity': self.opacity
-        }
-        
+            self.root.winfo_rgb(color)
+        except tk.TclError:
+            return False
+        return True
+    
+    def valid_font_family(self, family):
+        """Only installed families; Tk would silently substitute another font"""
+        return family in tkfont.families(self.root)
+    
+    def keep_on_screen(self):
+        """Move the clock back onto a monitor if it is (partly) off screen; returns True if moved"""
+        x, y = self.monitors.clamp(self.x_position, self.y_position, self.window_width, self.window_height)
+        if (x, y) == (self.x_position, self.y_position):
+            return False
+        self.x_position, self.y_position = x, y
+        self.clock_window.geometry(f'+{x}+{y}')
+        return True
+    
+    def on_clock_configure(self, event):
+        """Refresh the monitor layout when something other than the clock moved its window"""
+        if event.widget is not self.clock_window or self.drag_origin is not None:
+            return
+        # Our own geometry calls also report Configure; skip those
+        if (event.x, event.y, event.width, event.height) == (
+            self.x_position, self.y_position, self.window_width, self.window_height
+        ):
+            return
+        if self.layout_after_id is None:
+            self.layout_after_id = self.root.after(self.LAYOUT_SETTLE_MS, self.refresh_layout)
+    
+    def refresh_layout(self):
+        self.layout_after_id = None
+        self.monitors.refresh()
+        if self.keep_on_screen():
+            self.save_config()
+    
+    def check_config(self):
+        """Stat the config file on a slow timer; reload it if someone else changed it"""
+        self.config_after_id = None
+        self.wakeups['config_poll'] += 1
+        try:
+            signature = config_file_signature(self.config_file)
+            if signature != self.config_signature:
+                self.config_signature = signature
+                if not self.config_writer.wrote(signature):
+                    self.config_writer.forget_written()
+                    if signature is not None:
+                        self.reload_config()
+        finally:
+            # A reload that fails halfway must not end hot-reloading
+            delay = self.CONFIG_POLL_MS * (self.SUSPENDED_POLL_FACTOR if self.ticks_suspended else 1)
+            self.config_after_id = self.root.after(delay, self.check_config)
+    
+    def reload_config(self):
+        """Apply only the settings an external edit changed, keeping the window"""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            config = self.read_config()
         except Exception as e:
-            print(f"Error saving config: {e}")
+            # Likely caught mid-write; the finished write changes the signature again
+            print(f"Error reloading config: {e}")
+            return
+        if config['x_position'] is None:
+            config['x_position'] = self.x_position
+        settings = self.settings_from_config(config)
+        # Alarms belong to the running alarm engine and are not reloaded
+        del settings['alarm_entries']
+        
+        # Compare against the live alarm, stopwatch and theme state, not stale attributes
+        self.sync_owned_settings()
+        changed = {name for name, value in settings.items()
+                   if name != 'world_clock' and value != getattr(self, name)}
+        if settings['world_clock'].config_entries() != self.world_clock.config_entries():
+            changed.add('world_clock')
+        if not changed:
+            return
+        for name in changed:
+            setattr(self, name, settings[name])
+        self.config_reloads += 1
+        
+        if 'world_clock' in changed:
+            self.build_world_rows()
+        if changed & {'time_format', 'show_seconds', 'show_date', 'world_clock'}:
+            self.restart_ticks()
+        if 'font_size' in changed:
+            self.apply_font_size()
+        elif changed & {'time_format', 'show_seconds', 'show_date', 'world_clock'}:
+            self.update_window_geometry()
+        if 'text_color' in changed or 'world_clock' in changed:
+            self.apply_clock_color(self.text_color)
+        if changed & {'x_position', 'y_position'}:
+            self.clock_window.geometry(f'+{self.x_position}+{self.y_position}')
+            self.keep_on_screen()
+        if 'opacity' in changed:
+            self.fader.set_opacity(self.opacity)
+        if 'clock_font' in changed:
+            self.apply_clock_font()
+        if 'theme_mode' in changed:
+            self.theme.set_mode(self.theme_mode)
+        if 'tray_style' in changed or ('time_format' in changed and self.tray_style == 'digital'):
+            self.apply_tray_style(self.tray_style)
+        if 'stopwatch_hz' in changed:
+            self.stopwatch.set_rate(self.stopwatch_hz)
+        if 'stopwatch_precision' in changed:
+            self.stopwatch.precision = self.stopwatch_precision
+            self.update_window_geometry()
+        if changed & {'suspend_when_idle', 'idle_timeout'}:
+            self.apply_idle_setting()
+        if changed & {'time_sync_enabled', 'ntp_server'}:
+            self.apply_time_sync()
+        
+        later = changed.intersection(self.RESTART_SETTINGS)
+        if later:
+            print(f"Config change to {', '.join(sorted(later))} takes effect after a restart")
+    
+    def apply_time_sync(self):
+        """Start, restart or stop the SNTP sync thread to match the settings"""
+        offset = 0.0
+        if self.time_sync is not None:
+            if self.time_sync_enabled and self.time_sync.server == self.ntp_server:
+                return
+            # A new server slews on from the current correction instead of jumping to zero
+            offset = self.time_sync.offset()
+            self.time_sync.stop()
+            self.time_sync = None
+        if self.time_sync_enabled:
+            self.time_sync = TimeSync(self.ntp_server, offset=offset)
+            self.time_sync.start()
+    
+    def set_time_sync(self, enabled, server=None):
+        """Turn SNTP time correction on or off, optionally with a new server"""
+        self.time_sync_enabled = enabled
+        if server:
+            self.ntp_server = server
+        self.apply_time_sync()
+        self.save_config()
+    
+    def apply_idle_setting(self):
+        """Start or stop idle polling to match suspend_when_idle"""
+        if self.idle_after_id is not None:
+            self.root.after_cancel(self.idle_after_id)
+            self.idle_after_id = None
+        if self.suspend_when_idle:
+            self.check_idle()
+        else:
+            self.session_idle = False
+            self.update_tick_state()
+    
+    def sync_owned_settings(self):
+        """Copy settings owned by the alarm, stopwatch and theme objects into attributes"""
+        self.alarm_entries = self.alarms.config_entries()
+        self.stopwatch_hz = self.stopwatch.target_hz
+        self.stopwatch_precision = self.stopwatch.precision
+        self.theme_mode = self.theme.mode
+    
+    def config_dict(self):
+        self.sync_owned_settings()
+        return super().config_dict()
     
     def show_context_menu(self, event):
         """Show context menu with all options"""
-        menu = SimpleContextMenu(self.root)
-        
-        menu.add_command(label="Customize Appearance", command=self.show_appearance_popup)
-        menu.add_separator()
-        menu.add_command(label="Exit", command=self.close_app)
-        
+        t0 = time.perf_counter()
+        cold = self.context_menu is None
+        if cold:
+            self.context_menu = SimpleContextMenu(self.root, self.theme)
+            self.context_menu.add_command(label="Customize Appearance", command=self.show_appearance_popup)
+            self.context_menu.add_separator()
+            self.context_menu.add_command(label="Stopwatch Start/Pause", command=self.toggle_stopwatch)
+            self.context_menu.add_command(label="Stopwatch Reset", command=self.stopwatch.reset)
+            self.context_menu.add_command(label="Back to Clock", command=self.stop_stopwatch)
+            self.context_menu.add_separator()
+            self.context_menu.add_command(label="Exit", command=self.close_app)
+        
+        # tk_popup blocks while the menu is open on some platforms, so time
+        # up to the moment the menu is about to post
+        def posted():
+            self.record_popup_latency('context_menu', cold, time.perf_counter() - t0)
+        
+        self.context_menu.config(postcommand=posted)
         try:
-            menu.tk_popup(event.x_root, event.y_root)
+            self.context_menu.tk_popup(event.x_root, event.y_root)
         finally:
-            menu.grab_release()
+            self.context_menu.grab_release()
     
     def toggle_always_on_top(self):
         """Toggle always on top attribute"""
@@ -163,323 +2265,720 @@ class TransparentClock:
     
     def show_format_popup(self):
         """Show time format selection popup"""
-        if self.popup_window is not None:
-            try:
-                if self.popup_window.winfo_exists():
-                    self.popup_window.destroy()
-                    return
-            except:
-                pass
-        
-        self.popup_window = tk.Toplevel(self.root)
-        self.popup_window.overrideredirect(True)
-        self.popup_window.attributes('-topmost', True)
-        
-        bg_color = '#f7f7f7'
-        border_color = '#c7c7cc'
-        
-        # Position
-        screen_width = self.popup_window.winfo_screenwidth()
-        screen_height = self.popup_window.winfo_screenheight()
-        popup_width = 320
-        popup_height = 260
-        x_pos = screen_width - popup_width - 20
-        y_pos = screen_height - popup_height - 60
-        
-        self.popup_window.geometry(f'{popup_width}x{popup_height}+{x_pos}+{y_pos}')
+        self.show_popup('format', self.build_format_popup, self.sync_format_popup)
+    
+    def build_format_popup(self):
+        """Build the time format popup once; later opens only re-show it"""
+        popup = self.create_popup_window()
         
         # Shadow and container
-        shadow_frame = tk.Frame(self.popup_window, bg='#d0d0d0')
+        shadow_frame = self.theme.create(tk.Frame, popup, bg='shadow')
         shadow_frame.place(x=0, y=0, relwidth=1, relheight=1)
         
-        main_container = tk.Frame(
-            self.popup_window,
-            bg=bg_color,
+        main_container = self.theme.create(
+            tk.Frame,
+            popup,
+            bg='surface',
             highlightthickness=1,
-            highlightbackground=border_color
+            highlightbackground='border'
         )
         main_container.place(x=0, y=0, relwidth=1, relheight=1)
         
-        content = tk.Frame(main_container, bg=bg_color)
+        content = self.theme.create(tk.Frame, main_container, bg='surface')
         content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
         # Title
-        title = tk.Label(
+        title = self.theme.create(
+            tk.Label,
             content,
             text="Time Format",
-            font=('SF Pro Display', 15, 'bold') if platform.system() == 'Darwin' else ('Segoe UI', 12, 'bold'),
-            bg=bg_color,
-            fg='#1d1d1f'
+            font='title',
+            bg='surface',
+            fg='text'
         )
         title.pack(anchor='w', pady=(0, 20))
         
         # 12/24 hour toggle
-        format_var = tk.StringVar(value=self.time_format)
+        self.format_var = tk.StringVar(value=self.time_format)
         
         for fmt, label in [('12h', '12-Hour Format (3:45 PM)'), ('24h', '24-Hour Format (15:45)')]:
-            rb_frame = tk.Frame(content, bg=bg_color)
+            rb_frame = self.theme.create(tk.Frame, content, bg='surface')
             rb_frame.pack(fill=tk.X, pady=5)
             
-            rb = tk.Radiobutton(
+            rb = self.theme.create(
+                tk.Radiobutton,
                 rb_frame,
                 text=label,
-                variable=format_var,
+                variable=self.format_var,
                 value=fmt,
-                font=('SF Pro Text', 12) if platform.system() == 'Darwin' else ('Segoe UI', 10),
-                bg=bg_color,
-                fg='#1d1d1f',
-                selectcolor=bg_color,
-                activebackground=bg_color,
+                font='body',
+                bg='surface',
+                fg='text',
+                selectcolor='surface',
+                activebackground='surface',
+                activeforeground='text',
                 command=lambda f=fmt: self.set_time_format(f)
             )
             rb.pack(anchor='w')
         
         # Show seconds toggle
-        seconds_var = tk.BooleanVar(value=self.show_seconds)
+        self.seconds_var = tk.BooleanVar(value=self.show_seconds)
         
-        tk.Frame(content, bg='#d1d1d6', height=1).pack(fill=tk.X, pady=15)
+        self.theme.create(tk.Frame, content, bg='separator', height=1).pack(fill=tk.X, pady=15)
         
-        cb_frame = tk.Frame(content, bg=bg_color)
+        cb_frame = self.theme.create(tk.Frame, content, bg='surface')
         cb_frame.pack(fill=tk.X, pady=5)
         
-        cb_seconds = tk.Checkbutton(
+        cb_seconds = self.theme.create(
+            tk.Checkbutton,
             cb_frame,
             text="Show Seconds",
-            variable=seconds_var,
-            font=('SF Pro Text', 12) if platform.system() == 'Darwin' else ('Segoe UI', 10),
-            bg=bg_color,
-            fg='#1d1d1f',
-            selectcolor=bg_color,
-            activebackground=bg_color,
-            command=lambda: self.toggle_seconds(seconds_var.get())
+            variable=self.seconds_var,
+            font='body',
+            bg='surface',
+            fg='text',
+            selectcolor='surface',
+            activebackground='surface',
+            activeforeground='text',
+            command=lambda: self.toggle_seconds(self.seconds_var.get())
         )
         cb_seconds.pack(anchor='w')
         
         # Show date toggle
-        date_var = tk.BooleanVar(value=self.show_date)
+        self.date_var = tk.BooleanVar(value=self.show_date)
         
-        cb_date = tk.Checkbutton(
+        cb_date = self.theme.create(
+            tk.Checkbutton,
             cb_frame,
             text="Show Date",
-            variable=date_var,
-            font=('SF Pro Text', 12) if platform.system() == 'Darwin' else ('Segoe UI', 10),
-            bg=bg_color,
-            fg='#1d1d1f',
-            selectcolor=bg_color,
-            activebackground=bg_color,
-            command=lambda: self.toggle_date(date_var.get())
+            variable=self.date_var,
+            font='body',
+            bg='surface',
+            fg='text',
+            selectcolor='surface',
+            activebackground='surface',
+            activeforeground='text',
+            command=lambda: self.toggle_date(self.date_var.get())
         )
         cb_date.pack(anchor='w', pady=(5, 0))
         
         # Done button
         self.create_done_button(content)
         
-        self.popup_window.bind('<FocusOut>', lambda e: self.close_popup())
-        self.popup_window.after(10, lambda: self.popup_window.focus_force())
+        return popup
+    
+    def sync_format_popup(self):
+        """Load current settings into the format popup"""
+        self.format_var.set(self.time_format)
+        self.seconds_var.set(self.show_seconds)
+        self.date_var.set(self.show_date)
     
     def set_time_format(self, fmt):
         """Set time format (12h or 24h)"""
         self.time_format = fmt
+        self.restart_ticks()
+        self.update_window_geometry()
+        if self.tray_style == 'digital':
+            self.apply_tray_style('digital')
         self.save_config()
     
     def toggle_seconds(self, show):
         """Toggle seconds display"""
         self.show_seconds = show
+        self.restart_ticks()
+        self.update_window_geometry()
         self.save_config()
     
     def toggle_date(self, show):
         """Toggle date display"""
         self.show_date = show
+        self.restart_ticks()
+        self.update_window_geometry()
+        self.save_config()
+    
+    def set_text_color(self, color):
+        """Set clock text color"""
+        self.text_color = color
+        self.apply_clock_color(self.text_color)
         self.save_config()
     
+    def apply_clock_color(self, color):
+        """Color the clock face and world clock rows"""
+        self.clock_renderer.set_color(color)
+        for label in self.world_labels:
+            label.config(fg=color)
+    
     def show_appearance_popup(self):
         """Show appearance customization popup"""
-        if self.popup_window is not None:
-            try:
-                if self.popup_window.winfo_exists():
-                    self.popup_window.destroy()
-                    return
-            except:
-                pass
-        
-        self.popup_window = tk.Toplevel(self.root)
-        self.popup_window.overrideredirect(True)
-        self.popup_window.attributes('-topmost', True)
-        
-        bg_color = '#f7f7f7'
-        border_color = '#c7c7cc'
-        
-        # Position
-        screen_width = self.popup_window.winfo_screenwidth()
-        screen_height = self.popup_window.winfo_screenheight()
-        popup_width = 320
-        popup_height = 340
-        x_pos = screen_width - popup_width - 20
-        y_pos = screen_height - popup_height - 60
-        
-        self.popup_window.geometry(f'{popup_width}x{popup_height}+{x_pos}+{y_pos}')
+        self.show_popup('appearance', self.build_appearance_popup, self.sync_appearance_popup)
+    
+    def build_appearance_popup(self):
+        """Build the appearance popup once; later opens only re-show it"""
+        popup = self.create_popup_window()
         
         # Shadow and container
-        shadow_frame = tk.Frame(self.popup_window, bg='#d0d0d0')
+        shadow_frame = self.theme.create(tk.Frame, popup, bg='shadow')
         shadow_frame.place(x=0, y=0, relwidth=1, relheight=1)
         
-        main_container = tk.Frame(
-            self.popup_window,
-            bg=bg_color,
+        main_container = self.theme.create(
+            tk.Frame,
+            popup,
+            bg='surface',
             highlightthickness=1,
-            highlightbackground=border_color
+            highlightbackground='border'
         )
         main_container.place(x=0, y=0, relwidth=1, relheight=1)
         
-        content = tk.Frame(main_container, bg=bg_color)
+        content = self.theme.create(tk.Frame, main_container, bg='surface')
         content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
         # Title
-        title = tk.Label(
+        title = self.theme.create(
+            tk.Label,
             content,
             text="Customize Appearance",
-            font=('SF Pro Display', 15, 'bold') if platform.system() == 'Darwin' else ('Segoe UI', 12, 'bold'),
-            bg=bg_color,
-            fg='#1d1d1f'
+            font='title',
+            bg='surface',
+            fg='text'
         )
         title.pack(anchor='w', pady=(0, 20))
         
         # Font size section
-        self.create_size_slider(content, bg_color)
+        self.create_size_slider(content)
+        self.create_opacity_slider(content)
         
-        tk.Frame(content, bg='#d1d1d6', height=1).pack(fill=tk.X, pady=15)
+        self.theme.create(tk.Frame, content, bg='separator', height=1).pack(fill=tk.X, pady=15)
         
         # Color picker
-        color_frame = tk.Frame(content, bg=bg_color)
+        color_frame = self.theme.create(tk.Frame, content, bg='surface')
         color_frame.pack(fill=tk.X, pady=(0, 10))
         
-        tk.Label(
+        self.theme.create(
+            tk.Label,
             color_frame,
             text="Text Color",
-            font=('SF Pro Text', 12) if platform.system() == 'Darwin' else ('Segoe UI', 10),
-            bg=bg_color,
-            fg='#1d1d1f'
+            font='body',
+            bg='surface',
+            fg='text'
         ).pack(side=tk.LEFT)
         
-        color_btn = tk.Label(
+        # Current color preview and hex entry
+        self.color_swatch = self.theme.create(
+            tk.Frame,
             color_frame,
-            text="  Choose  ",
-            font=('SF Pro Text', 11) if platform.system() == 'Darwin' else ('Segoe UI', 9),
-            bg='#0066ff',
-            fg='#ffffff',
-            padx=15,
+            width=22,
+            height=22,
+            bg=self.text_color,
+            highlightthickness=1,
+            highlightbackground='border'
+        )
+        self.color_swatch.pack(side=tk.RIGHT, padx=(8, 0))
+        
+        self.hex_var = tk.StringVar(value=self.text_color)
+        hex_entry = self.theme.create(
+            tk.Entry,
+            color_frame,
+            textvariable=self.hex_var,
+            width=9,
+            font='caption',
+            bg='field',
+            fg='text',
+            insertbackground='text',
+            relief=tk.FLAT,
+            highlightthickness=1,
+            highlightbackground='border'
+        )
+        hex_entry.pack(side=tk.RIGHT)
+        hex_entry.bind('<Return>', lambda e: self.commit_hex_color())
+        
+        # Palette of precomputed swatch images
+        palette_frame = self.theme.create(tk.Frame, content, bg='surface')
+        palette_frame.pack(fill=tk.X, pady=(0, 8))
+        
+        self.swatch_images = {}
+        for i, color in enumerate(self.PALETTE):
+            image = tk.PhotoImage(width=18, height=18)
+            image.put(color, to=(0, 0, 18, 18))
+            self.swatch_images[color] = image
+            swatch = self.theme.create(
+                tk.Label,
+                palette_frame,
+                image=image,
+                bg='surface',
+                borderwidth=0,
+                highlightthickness=1,
+                highlightbackground='border',
+                cursor='hand2'
+            )
+            swatch.grid(row=i // 8, column=i % 8, padx=(0, 8), pady=(0, 6))
+            swatch.bind('<Button-1>', lambda e, c=color: self.commit_color(c))
+        
+        # HSV sliders preview live and commit on release
+        self.hsv_scales = []
+        for label, maximum in (('H', 360), ('S', 100), ('V', 100)):
+            row = self.theme.create(tk.Frame, content, bg='surface')
+            row.pack(fill=tk.X)
+            
+            self.theme.create(
+                tk.Label,
+                row,
+                text=label,
+                width=2,
+                font='caption',
+                bg='surface',
+                fg='secondary'
+            ).pack(side=tk.LEFT)
+            
+            scale = self.theme.create(
+                tk.Scale,
+                row,
+                from_=0,
+                to=maximum,
+                orient=tk.HORIZONTAL,
+                command=self.on_hsv_change,
+                bg='surface',
+                highlightthickness=0,
+                troughcolor='trough',
+                activebackground='accent',
+                sliderrelief=tk.FLAT,
+                length=240,
+                showvalue=False,
+                borderwidth=0,
+                width=10
+            )
+            scale.pack(side=tk.LEFT)
+            scale.bind('<ButtonRelease-1>', lambda e: self.commit_color())
+            self.hsv_scales.append(scale)
+        
+        # Done button
+        self.create_done_button(content)
+        
+        return popup
+    
+    def sync_appearance_popup(self):
+        """Load current settings into the appearance popup"""
+        self.size_slider.set(self.font_size)
+        self.size_value.config(text=str(self.font_size))
+        self.opacity_slider.set(round(self.opacity * 100))
+        self.sync_color_picker(self.text_color)
+    
+    def sync_color_picker(self, color):
+        """Show a color in the swatch, hex entry and HSV sliders"""
+        self.color_swatch.config(bg=color)
+        self.hex_var.set(color)
+        r, g, b = (c / 65535 for c in self.root.winfo_rgb(color))
+        h, s, v = colorsys.rgb_to_hsv(r, g, b)
+        self.hsv_synced = (round(h * 360), round(s * 100), round(v * 100))
+        for scale, value in zip(self.hsv_scales, self.hsv_synced):
+            scale.set(value)
+    
+    def on_hsv_change(self, value):
+        # Scale callbacks also fire for programmatic sets; ignore those
+        hsv = tuple(scale.get() for scale in self.hsv_scales)
+        if hsv == self.hsv_synced:
+            return
+        self.hsv_synced = hsv
+        r, g, b = colorsys.hsv_to_rgb(hsv[0] / 360, hsv[1] / 100, hsv[2] / 100)
+        color = f'#{round(r * 255):02x}{round(g * 255):02x}{round(b * 255):02x}'
+        self.color_swatch.config(bg=color)
+        self.hex_var.set(color)
+        self.preview_color(color)
+    
+    def preview_color(self, color):
+        """Show a color on the clock without saving it, at most once per preview interval"""
+        self.color_preview = color
+        if self.color_preview_after is None:
+            self.color_preview_after = self.root.after(self.COLOR_PREVIEW_MS, self.apply_color_preview)
+    
+    def apply_color_preview(self):
+        self.color_preview_after = None
+        if self.color_preview is not None:
+            self.apply_clock_color(self.color_preview)
+    
+    def commit_color(self, color=None):
+        """Apply and save a color (defaults to the one being previewed)"""
+        if self.color_preview_after is not None:
+            self.root.after_cancel(self.color_preview_after)
+            self.color_preview_after = None
+        color = color or self.color_preview
+        self.color_preview = None
+        if color is None:
+            return
+        if color != self.hex_var.get() and 'appearance' in self.popups:
+            self.sync_color_picker(color)
+        if color != self.text_color:
+            self.set_text_color(color)
+        else:
+            self.apply_clock_color(color)
+    
+    def commit_hex_color(self):
+        color = self.hex_var.get().strip()
+        if re.fullmatch(r'#(?:[0-9a-fA-F]{3}){1,2}', color):
+            self.sync_color_picker(color)
+            self.commit_color(color)
+        else:
+            self.hex_var.set(self.text_color)
+    
+    def create_popup_window(self):
+        """Create a hidden, undecorated popup toplevel"""
+        popup = tk.Toplevel(self.root)
+        popup.withdraw()
+        popup.overrideredirect(True)
+        popup.attributes('-topmost', True)
+        popup.bind('<FocusOut>', self.on_popup_focus_out)
+        popup.bind('<Map>', self.on_popup_mapped)
+        return popup
+    
+    def on_popup_focus_out(self, event):
+        # Focus moving to a widget inside the popup (e.g. the hex entry)
+        # also reports FocusOut; only close once focus has left the popup
+        def check():
+            try:
+                focus = self.root.focus_get()
+            except KeyError:
+                focus = None
+            if self.popup_window is not None and (focus is None or focus.winfo_toplevel() is not self.popup_window):
+                self.close_popup()
+        
+        self.root.after(10, check)
+    
+    def show_popup(self, name, build, sync):
+        """Show a popup, building it on first use; closes the open popup instead if any"""
+        if self.popup_window is not None:
+            self.close_popup()
+            return
+        
+        t0 = time.perf_counter()
+        popup = self.popups.get(name)
+        cold = popup is None
+        if cold:
+            popup = build()
+            self.popups[name] = popup
+        sync()
+        
+        # Position on the monitor showing the clock, which may have moved since the last open
+        width, height = self.POPUP_SIZES[name]
+        x_pos, y_pos = self.monitors.popup_position(width, height, self.x_position, self.y_position)
+        popup.geometry(f'{width}x{height}+{x_pos}+{y_pos}')
+        
+        self.popup_opening = (name, cold, t0)
+        self.popup_window = popup
+        popup.deiconify()
+        popup.after(10, popup.focus_force)
+    
+    def on_popup_mapped(self, event):
+        if self.popup_opening is None or event.widget is not self.popup_window:
+            return
+        name, cold, t0 = self.popup_opening
+        self.popup_opening = None
+        self.record_popup_latency(name, cold, time.perf_counter() - t0)
+    
+    def record_popup_latency(self, name, cold, latency):
+        """Record open-to-visible latency; cold opens include building the widgets"""
+        key = f"{name}.{'cold' if cold else 'warm'}"
+        if key not in self.popup_latency:
+            self.popup_latency[key] = LatencyStats()
+        self.popup_latency[key].record(latency)
+    
+    def show_diagnostics_popup(self):
+        """Show runtime diagnostics popup"""
+        self.show_popup('diagnostics', self.build_diagnostics_popup, self.sync_diagnostics_popup)
+    
+    def build_diagnostics_popup(self):
+        """Build the diagnostics popup once; later opens only re-show it"""
+        popup = self.create_popup_window()
+        
+        # Shadow and container
+        shadow_frame = self.theme.create(tk.Frame, popup, bg='shadow')
+        shadow_frame.place(x=0, y=0, relwidth=1, relheight=1)
+        
+        main_container = self.theme.create(
+            tk.Frame,
+            popup,
+            bg='surface',
+            highlightthickness=1,
+            highlightbackground='border'
+        )
+        main_container.place(x=0, y=0, relwidth=1, relheight=1)
+        
+        content = self.theme.create(tk.Frame, main_container, bg='surface')
+        content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        # Title row with save button
+        title_frame = self.theme.create(tk.Frame, content, bg='surface')
+        title_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.theme.create(
+            tk.Label,
+            title_frame,
+            text="Diagnostics",
+            font='title',
+            bg='surface',
+            fg='text'
+        ).pack(side=tk.LEFT)
+        
+        save_btn = self.theme.create(
+            tk.Label,
+            title_frame,
+            text="  Save JSON  ",
+            font='caption',
+            bg='accent',
+            fg='on_accent',
+            padx=10,
             pady=5,
             cursor='hand2'
         )
-        color_btn.pack(side=tk.RIGHT)
+        save_btn.pack(side=tk.RIGHT)
+        save_btn.bind('<Button-1>', lambda e: self.dump_diagnostics())
         
-        def choose_color(e):
-            color = colorchooser.askcolor(initialcolor=self.text_color)
-            if color[1]:
-                self.text_color = color[1]
-                self.time_label.config(fg=self.text_color)
-                self.save_config()
+        self.diagnostics_status = self.theme.create(
+            tk.Label,
+            content,
+            text="",
+            font='caption',
+            bg='surface',
+            fg='secondary',
+            anchor='w'
+        )
+        self.diagnostics_status.pack(fill=tk.X)
         
-        color_btn.bind('<Button-1>', choose_color)
+        self.diagnostics_text = self.theme.create(
+            tk.Text,
+            content,
+            font='mono',
+            bg='field',
+            fg='text',
+            insertbackground='text',
+            relief=tk.FLAT,
+            highlightthickness=1,
+            highlightbackground='border',
+            height=18,
+            wrap=tk.NONE
+        )
+        self.diagnostics_text.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
         
         # Done button
         self.create_done_button(content)
         
-        self.popup_window.bind('<FocusOut>', lambda e: self.close_popup())
-        self.popup_window.after(10, lambda: self.popup_window.focus_force())
+        return popup
+    
+    def sync_diagnostics_popup(self):
+        """Load fresh diagnostics into the popup"""
+        self.diagnostics_text.config(state=tk.NORMAL)
+        self.diagnostics_text.delete('1.0', tk.END)
+        self.diagnostics_text.insert('1.0', json.dumps(self.collect_diagnostics(), indent=2))
+        self.diagnostics_text.config(state=tk.DISABLED)
+        self.diagnostics_status.config(text="")
+    
+    def collect_diagnostics(self):
+        """Snapshot of all runtime metrics as a JSON-serializable dict"""
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'uptime_s': round(time.perf_counter() - self.profiler.t0, 1),
+            'platform': platform.platform(),
+            'startup': self.profiler.summary(),
+            'ticks': self.tick_scheduler.stats.summary(),
+            'render': self.clock_renderer.stats(),
+            'config_writes': self.config_writer.stats(),
+            'config_reloads': self.config_reloads,
+            'time_sync': self.time_sync.stats() if self.time_sync else None,
+            'popups': {name: stats.summary() for name, stats in self.popup_latency.items()},
+            'commands': self.commands.stats(),
+            'drag': dict(self.drag_stats),
+            'monitors': self.monitors.stats(),
+            'fade': self.fader.stats(),
+            'tray_face': self.tray_atlas.stats() if self.tray_atlas else None,
+            'font_metrics': self.font_metrics.stats(),
+            'wakeups': self.wakeup_stats(),
+            'rss_bytes': process_rss_bytes(),
+            'stalls': self.watchdog.summary() if self.watchdog else None,
+            'alarms': self.alarms.stats(),
+            'stopwatch': self.stopwatch.stats()
+        }
+    
+    def dump_diagnostics(self, path=None):
+        """Write diagnostics JSON to path (default: next to the config) off the Tk thread"""
+        if path is None:
+            path = os.path.join(
+                os.path.dirname(self.config_file),
+                f'transparent_clock_diagnostics_{datetime.now():%Y%m%d_%H%M%S}.json'
+            )
+        report = json.dumps(self.collect_diagnostics(), indent=2)
+        
+        def write():
+            try:
+                with open(path, 'w') as f:
+                    f.write(report)
+                message = f"Saved to {path}"
+            except OSError as e:
+                message = f"Error saving diagnostics: {e}"
+                print(message)
+            self.commands.post(self.set_diagnostics_status, message)
+        
+        threading.Thread(target=write, name='diagnostics-dump', daemon=True).start()
     
-    def create_size_slider(self, parent, bg_color):
+    def set_diagnostics_status(self, message):
+        if 'diagnostics' in self.popups:
+            self.diagnostics_status.config(text=message)
+    
+    def create_size_slider(self, parent):
         """Create size adjustment slider"""
-        slider_section = tk.Frame(parent, bg=bg_color)
+        slider_section = self.theme.create(tk.Frame, parent, bg='surface')
         slider_section.pack(fill=tk.X, pady=(0, 10))
         
         # Label
-        tk.Label(
+        self.theme.create(
+            tk.Label,
             slider_section,
             text="Font Size",
-            font=('SF Pro Text', 12) if platform.system() == 'Darwin' else ('Segoe UI', 10),
-            bg=bg_color,
-            fg='#1d1d1f'
+            font='body',
+            bg='surface',
+            fg='text'
         ).pack(anchor='w', pady=(0, 10))
         
         # Size indicators
-        size_labels_frame = tk.Frame(slider_section, bg=bg_color)
+        size_labels_frame = self.theme.create(tk.Frame, slider_section, bg='surface')
         size_labels_frame.pack(fill=tk.X, pady=(0, 8))
         
-        tk.Label(
+        self.theme.create(
+            tk.Label,
             size_labels_frame,
             text="A",
-            font=('SF Pro Text', 11) if platform.system() == 'Darwin' else ('Segoe UI', 9),
-            bg=bg_color,
-            fg='#86868b'
+            font='caption',
+            bg='surface',
+            fg='secondary'
         ).pack(side=tk.LEFT)
         
-        tk.Label(
+        self.theme.create(
+            tk.Label,
             size_labels_frame,
             text="A",
-            font=('SF Pro Text', 18, 'bold') if platform.system() == 'Darwin' else ('Segoe UI', 14, 'bold'),
-            bg=bg_color,
-            fg='#86868b'
+            font='marker',
+            bg='surface',
+            fg='secondary'
         ).pack(side=tk.RIGHT)
         
         # Current size display
-        size_display_frame = tk.Frame(slider_section, bg=bg_color)
+        size_display_frame = self.theme.create(tk.Frame, slider_section, bg='surface')
         size_display_frame.pack(pady=(0, 10))
         
-        size_value = tk.Label(
+        self.size_value = self.theme.create(
+            tk.Label,
             size_display_frame,
             text=str(self.font_size),
-            font=('SF Pro Display', 24, 'bold') if platform.system() == 'Darwin' else ('Segoe UI', 18, 'bold'),
-            bg=bg_color,
-            fg='#1d1d1f'
+            font='value',
+            bg='surface',
+            fg='text'
         )
-        size_value.pack(side=tk.LEFT)
+        self.size_value.pack(side=tk.LEFT)
         
-        size_unit = tk.Label(
+        size_unit = self.theme.create(
+            tk.Label,
             size_display_frame,
             text="pt",
-            font=('SF Pro Text', 14) if platform.system() == 'Darwin' else ('Segoe UI', 10),
-            bg=bg_color,
-            fg='#86868b'
+            font='unit',
+            bg='surface',
+            fg='secondary'
         )
         size_unit.pack(side=tk.LEFT, padx=(4, 0))
         
         def update_display(value):
-            size_value.config(text=str(int(float(value))))
-            self.update_font_size(value)
+            self.size_value.config(text=str(int(float(value))))
+            # Syncing the slider on open must not count as a change
+            if int(float(value)) != self.font_size:
+                self.update_font_size(value)
         
         # Slider
-        slider = tk.Scale(
+        self.size_slider = self.theme.create(
+            tk.Scale,
             slider_section,
             from_=12,
             to=72,
             orient=tk.HORIZONTAL,
             command=update_display,
-            bg=bg_color,
-            fg='#000000',
+            bg='surface',
+            fg='text',
+            highlightthickness=0,
+            troughcolor='trough',
+            activebackground='accent',
+            sliderrelief=tk.FLAT,
+            length=280,
+            showvalue=False,
+            borderwidth=0,
+            width=12
+        )
+        self.size_slider.set(self.font_size)
+        self.size_slider.pack()
+    
+    def create_opacity_slider(self, parent):
+        """Create opacity slider; the clock follows it live"""
+        row = self.theme.create(tk.Frame, parent, bg='surface')
+        row.pack(fill=tk.X)
+        
+        self.theme.create(
+            tk.Label,
+            row,
+            text="Opacity",
+            font='body',
+            bg='surface',
+            fg='text'
+        ).pack(side=tk.LEFT)
+        
+        self.opacity_value = self.theme.create(
+            tk.Label,
+            row,
+            text=f'{round(self.opacity * 100)}%',
+            font='caption',
+            bg='surface',
+            fg='secondary'
+        )
+        self.opacity_value.pack(side=tk.RIGHT)
+        
+        def update_opacity(value):
+            self.opacity_value.config(text=f'{int(float(value))}%')
+            # Syncing the slider on open must not count as a change
+            if int(float(value)) != round(self.opacity * 100):
+                self.set_opacity(int(float(value)))
+        
+        self.opacity_slider = self.theme.create(
+            tk.Scale,
+            parent,
+            from_=round(self.MIN_OPACITY * 100),
+            to=100,
+            orient=tk.HORIZONTAL,
+            command=update_opacity,
+            bg='surface',
+            fg='text',
             highlightthickness=0,
-            troughcolor='#e5e5e5',
-            activebackground='#0066ff',
+            troughcolor='trough',
+            activebackground='accent',
             sliderrelief=tk.FLAT,
             length=280,
             showvalue=False,
             borderwidth=0,
             width=12
         )
-        slider.set(self.font_size)
-        slider.pack()
+        self.opacity_slider.set(round(self.opacity * 100))
+        self.opacity_slider.pack(pady=(4, 0))
+    
+    def set_opacity(self, percent):
+        """Set clock window opacity in percent"""
+        self.opacity = min(100, max(round(self.MIN_OPACITY * 100), percent)) / 100
+        self.fader.set_opacity(self.opacity)
+        self.save_config()
     
     def create_done_button(self, parent):
         """Create done button"""
-        button_frame = tk.Frame(parent, bg='#f7f7f7')
+        button_frame = self.theme.create(tk.Frame, parent, bg='surface')
         button_frame.pack(fill=tk.X, pady=(15, 0))
         
-        done_btn = tk.Label(
+        done_btn = self.theme.create(
+            tk.Label,
             button_frame,
             text="Done",
-            font=('SF Pro Text', 14, 'bold') if platform.system() == 'Darwin' else ('Segoe UI', 11, 'bold'),
-            bg='#0066ff',
-            fg='#ffffff',
+            font='button',
+            bg='accent',
+            fg='on_accent',
             padx=40,
             pady=10,
             cursor='hand2'
@@ -487,10 +2986,10 @@ class TransparentClock:
         done_btn.pack()
         
         def on_btn_enter(e):
-            done_btn.config(bg='#0052cc')
+            self.theme.paint(done_btn, bg='accent_hover')
         
         def on_btn_leave(e):
-            done_btn.config(bg='#0066ff')
+            self.theme.paint(done_btn, bg='accent')
         
         def on_btn_click(e):
             self.close_popup()
@@ -500,124 +2999,917 @@ class TransparentClock:
         done_btn.bind('<Button-1>', on_btn_click)
     
     def close_popup(self):
-        """Safely close popup window"""
+        """Safely hide popup window; it is kept for the next open"""
+        if self.color_preview is not None:
+            self.commit_color()
         if self.popup_window is not None:
             try:
-                self.popup_window.destroy()
+                self.popup_window.withdraw()
             except:
                 pass
             self.popup_window = None
+            self.popup_opening = None
     
     def update_font_size(self, value):
-        """Update clock font size"""
+        """Update clock font size; a slider drag applies at most once per frame"""
         self.font_size = int(float(value))
-        system = platform.system()
-        font_family = 'SF Pro Display' if system == 'Darwin' else 'Segoe UI'
-        self.time_label.config(font=(font_family, self.font_size, 'bold'))
+        if self.font_after_id is None:
+            self.font_after_id = self.root.after(self.DRAG_FRAME_MS, self.apply_font_size)
+        self.save_config()
+    
+    def apply_font_size(self):
+        self.font_after_id = None
+        # Labels share the theme fonts, so resizing them updates every label
+        self.theme.set_clock_size(self.font_size, self.world_font_size())
+        self.clock_renderer.set_font(self.theme.fonts['clock'])
         
         # Adjust window size
-        self.window_width = max(160, int(self.font_size * 6.5))
-        self.window_height = max(60, int(self.font_size * 2.8))
+        self.update_window_geometry()
+    
+    def world_font_size(self):
+        return max(9, self.font_size // 2)
+    
+    def update_window_geometry(self):
+        """Size the window from measured text extents of the clock face and world rows"""
+        font_family = self.theme.clock_family
+        width, height = self.font_metrics.clock_extent(
+            font_family, self.font_size, self.time_format, self.show_seconds, self.show_date,
+            self.stopwatch.longest_text()
+        )
+        # Label padding (padx=10, pady=5) plus its border
+        width += 2 * (10 + self.LABEL_BORDER)
+        height += 2 * (5 + self.LABEL_BORDER)
+        
+        if self.world_clock.zones:
+            samples = self.world_clock.format_all(0)
+            digits = FontMetricsCache.widest(self.font_metrics.font(font_family, self.world_font_size()), '0123456789')
+            samples = [re.sub(r'\d', digits, text) for text in samples]
+            rows_width, rows_height = self.font_metrics.text_extent(font_family, self.world_font_size(), samples)
+            width = max(width, rows_width + 2 * (10 + self.LABEL_BORDER))
+            height += rows_height + 2 * self.LABEL_BORDER * len(samples)
+        
+        if (width, height) == (self.window_width, self.window_height):
+            return
+        self.window_width = width
+        self.window_height = height
+        self.clock_window.geometry(
+            f'{self.window_width}x{self.window_height}+{self.x_position}+{self.y_position}'
+        )
+    
+    def build_world_rows(self):
+        """Create one label per configured time zone"""
+        for label in self.world_labels:
+            label.destroy()
+        self.world_labels = []
+        self.world_texts = [None] * len(self.world_clock.zones)
+        
+        for _ in self.world_clock.zones:
+            label = tk.Label(
+                self.world_frame,
+                font=self.theme.fonts['world'],
+                bg=self.bg_color,
+                fg=self.text_color,
+                padx=10,
+                pady=0
+            )
+            label.pack()
+            label.bind('<Button-1>', self.start_move)
+            label.bind('<B1-Motion>', self.on_move)
+            label.bind('<ButtonRelease-1>', self.end_move)
+            label.bind('<Button-3>', self.show_context_menu)
+            self.world_labels.append(label)
+    
+    def load_tray_image(self):
+        """Load the tray icon from its PNG cache, drawing and caching it if missing"""
+        from PIL import Image
         
-        x_pos = self.clock_window.winfo_x()
-        y_pos = self.clock_window.winfo_y()
-        self.clock_window.geometry(f'{self.window_width}x{self.window_height}+{x_pos}+{y_pos}')
+        cache_path = os.path.join(
+            os.path.dirname(self.config_file),
+            f'.transparent_clock_tray_v{TRAY_ICON_VERSION}.png'
+        )
+        try:
+            icon_image = Image.open(cache_path)
+            icon_image.load()
+            return icon_image
+        except (OSError, ValueError):
+            pass
         
-        self.save_config()
+        icon_image = draw_tray_icon()
+        
+        try:
+            icon_image.save(cache_path, 'PNG')
+        except OSError as e:
+            print(f"Error caching tray icon: {e}")
+        
+        return icon_image
     
     def create_tray_icon(self):
         """Create system tray icon"""
-        icon_image = Image.new('RGBA', (64, 64), color=(0, 0, 0, 0))
-        draw = ImageDraw.Draw(icon_image)
-        
-        # Clock circle
-        draw.ellipse([12, 12, 52, 52], fill='#0066ff', outline='#0066ff')
-        draw.ellipse([16, 16, 48, 48], fill='white', outline='white')
-        
-        # Clock hands
-        draw.rectangle([30, 18, 34, 32], fill='#0066ff')
-        draw.rectangle([30, 32, 42, 34], fill='#0066ff')
-        
-        # Center dot
-        draw.ellipse([30, 30, 34, 34], fill='#0066ff')
+        import pystray
+        from pystray import MenuItem as item
+        self.profiler.mark('tray_imports')
+        
+        icon_image = self.load_tray_image() if self.tray_style == 'static' else self.start_tray_face()
+        
+        tray_styles = pystray.Menu(*(
+            item(
+                style.capitalize(),
+                self.tray_style_action(style),
+                checked=lambda menu_item, style=style: self.tray_style == style,
+                radio=True
+            )
+            for style in TrayFaceAtlas.STYLES
+        ))
         
         menu = pystray.Menu(
             item('Customize Appearance', self.tray_customize),
             item('Time Format', self.tray_format),
+            item('Tray Icon', tray_styles),
             pystray.Menu.SEPARATOR,
             item('Show Clock', self.show_clock),
             item('Hide Clock', self.hide_clock),
             pystray.Menu.SEPARATOR,
+            item('Diagnostics', self.tray_diagnostics),
+            pystray.Menu.SEPARATOR,
             item('Exit', self.tray_exit)
         )
         
         self.tray_icon = pystray.Icon("clock", icon_image, "Transparent Clock", menu)
-        tray_thread = threading.Thread(target=self.tray_icon.run, daemon=True)
+        tray_thread = threading.Thread(target=self.tray_icon.run, args=(self.tray_setup,), daemon=True)
         tray_thread.start()
     
+    def tray_setup(self, icon):
+        """Runs on the tray thread once the icon can be shown"""
+        icon.visible = True
+        self.profiler.mark('tray_ready')
+        if self.on_tray_ready:
+            self.on_tray_ready()
+    
+    def start_tray_face(self):
+        """Switch to a live face atlas for the current style and return the current face"""
+        self.tray_atlas = TrayFaceAtlas(
+            self.tray_style,
+            self.time_format,
+            os.path.dirname(self.config_file),
+            self.theme.families['display']
+        )
+        self.tray_atlas.start_loading()
+        self.tray_face = self.tray_atlas.frame(datetime.fromtimestamp(self.now()))
+        # The immediate first tick finds this same face and swaps nothing
+        self.tray_ticks.start(60.0)
+        return self.tray_face
+    
+    def update_tray_face(self):
+        """Swap the tray icon image when the minute changes"""
+        self.wakeups['tray_tick'] += 1
+        if self.tray_atlas is None:
+            return
+        face = self.tray_atlas.frame(datetime.fromtimestamp(self.now()))
+        if face is not self.tray_face and self.tray_icon is not None:
+            self.tray_face = face
+            self.tray_icon.icon = face
+    
+    def set_tray_style(self, style):
+        """Show a static, analog or digital tray icon"""
+        self.apply_tray_style(style)
+        self.save_config()
+    
+    def apply_tray_style(self, style):
+        self.tray_style = style
+        self.tray_ticks.cancel()
+        self.tray_atlas = None
+        self.tray_face = None
+        if self.tray_icon is not None:
+            if style == 'static':
+                self.tray_icon.icon = self.load_tray_image()
+            else:
+                self.tray_icon.icon = self.start_tray_face()
+    
+    def tray_style_action(self, style):
+        return lambda: self.commands.post(self.set_tray_style, style)
+    
     def tray_customize(self):
-        self.root.after(0, self.show_appearance_popup)
+        self.commands.post(self.show_appearance_popup)
     
     def tray_format(self):
-        self.root.after(0, self.show_format_popup)
+        self.commands.post(self.show_format_popup)
+    
+    def tray_diagnostics(self):
+        self.commands.post(self.show_diagnostics_popup)
     
     def show_clock(self):
-        self.root.after(0, self.clock_window.deiconify)
+        self.commands.post(self.set_clock_visible, True)
     
     def hide_clock(self):
-        self.root.after(0, self.clock_window.withdraw)
+        self.commands.post(self.set_clock_visible, False)
     
     def tray_exit(self):
-        self.root.after(0, self.close_app)
+        self.commands.post(self.close_app)
+    
+    def handle_remote_command(self, command, args):
+        """Validate a forwarded command and hand it to the Tk thread (IPC thread)"""
+        if command == 'show':
+            call = (self.set_clock_visible, True)
+        elif command == 'hide':
+            call = (self.set_clock_visible, False)
+        elif command == 'customize':
+            call = (self.show_appearance_popup,)
+        elif command == 'format':
+            call = (self.show_format_popup,)
+        elif command == 'exit':
+            call = (self.close_app,)
+        elif command in ('alarm', 'alarm-daily'):
+            if not args or not re.fullmatch(r'\d{1,2}:\d{2}', args[0]):
+                raise ValueError(f'{command} needs a time like 07:30')
+            hour, minute = (int(part) for part in args[0].split(':'))
+            if hour > 23 or minute > 59:
+                raise ValueError(f'invalid time: {args[0]}')
+            now = self.now()
+            today = datetime.fromtimestamp(now).date()
+            due = datetime.combine(today, dt_time(hour, minute)).timestamp()
+            if due <= now:
+                due = datetime.combine(today + timedelta(days=1), dt_time(hour, minute)).timestamp()
+            alarm = Alarm('alarm', due, ' '.join(args[1:]), 'daily' if command == 'alarm-daily' else None)
+            call = (self.alarms.add, alarm)
+        elif command == 'remind':
+            if not args or not args[0].isdigit() or int(args[0]) < 1:
+                raise ValueError('remind needs an interval in minutes')
+            interval = int(args[0]) * 60
+            call = (self.alarms.add, Alarm('reminder', self.now() + interval, ' '.join(args[1:]), interval))
+        elif command == 'countdown':
+            if not args or not re.fullmatch(r'(\d+:)?\d+', args[0]):
+                raise ValueError('countdown needs SECONDS or MM:SS')
+            parts = [int(part) for part in args[0].split(':')]
+            seconds = parts[0] * 60 + parts[1] if len(parts) == 2 else parts[0]
+            call = (self.alarms.add, Alarm('countdown', self.now() + seconds, ' '.join(args[1:])))
+        elif command == 'cancel-alarm':
+            if len(args) != 1:
+                raise ValueError('cancel-alarm needs an alarm id')
+            call = (self.alarms.remove, args[0])
+        elif command == 'clear-alarms':
+            call = (self.alarms.clear,)
+        elif command == 'stopwatch':
+            actions = {
+                'start': self.stopwatch.start_stopwatch,
+                'toggle': self.toggle_stopwatch,
+                'pause': self.stopwatch.pause,
+                'resume': self.stopwatch.resume,
+                'reset': self.stopwatch.reset,
+                'off': self.stop_stopwatch
+            }
+            if len(args) > 1 or (args and args[0] not in actions):
+                raise ValueError(f"stopwatch takes one of: {', '.join(actions)}")
+            call = (actions[args[0] if args else 'toggle'],)
+        elif command == 'timer':
+            if len(args) != 1 or not re.fullmatch(r'(\d+:)?\d+', args[0]):
+                raise ValueError('timer needs SECONDS or MM:SS')
+            parts = [int(part) for part in args[0].split(':')]
+            call = (self.start_countdown, parts[0] * 60 + parts[1] if len(parts) == 2 else parts[0])
+        elif command == 'stopwatch-rate':
+            if len(args) != 1 or not args[0].isdigit() or int(args[0]) not in StopwatchMode.RATES:
+                raise ValueError(f"stopwatch-rate needs one of: {', '.join(map(str, StopwatchMode.RATES))}")
+            call = (self.set_stopwatch_rate, int(args[0]))
+        elif command == 'diagnostics':
+            if len(args) > 1:
+                raise ValueError('diagnostics takes at most one output path')
+            call = (self.dump_diagnostics, os.path.abspath(args[0]) if args else None)
+        elif command == 'font-size':
+            if len(args) != 1 or not args[0].isdigit() or not 12 <= int(args[0]) <= 72:
+                raise ValueError('font-size needs a size between 12 and 72')
+            call = (self.update_font_size, int(args[0]))
+        elif command == 'opacity':
+            if len(args) != 1 or not args[0].isdigit() or not self.MIN_OPACITY * 100 <= int(args[0]) <= 100:
+                raise ValueError(f'opacity needs a percentage between {round(self.MIN_OPACITY * 100)} and 100')
+            call = (self.set_opacity, int(args[0]))
+        elif command == 'color':
+            if len(args) != 1 or not re.fullmatch(r'#(?:[0-9a-fA-F]{3}){1,2}', args[0]):
+                raise ValueError('color needs a hex color like #ff8800')
+            call = (self.set_text_color, args[0])
+        elif command == 'time-format':
+            if args not in (['12h'], ['24h']):
+                raise ValueError('time-format needs 12h or 24h')
+            call = (self.set_time_format, args[0])
+        elif command == 'time-sync':
+            if not args or args[0] not in ('on', 'off') or len(args) > 2 or (args[0] == 'off' and len(args) > 1):
+                raise ValueError('time-sync needs on [SERVER[:PORT]] or off')
+            if len(args) == 2 and not re.fullmatch(r'[\w.-]+(?::\d{1,5})?', args[1]):
+                raise ValueError(f'invalid SNTP server: {args[1]}')
+            call = (self.set_time_sync, args[0] == 'on', args[1] if len(args) == 2 else None)
+        elif command == 'tray-icon':
+            if len(args) != 1 or args[0] not in TrayFaceAtlas.STYLES:
+                raise ValueError(f"tray-icon needs one of: {', '.join(TrayFaceAtlas.STYLES)}")
+            call = (self.set_tray_style, args[0])
+        elif command == 'theme':
+            if len(args) != 1 or args[0] not in Theme.PALETTES:
+                raise ValueError(f"theme needs one of: {', '.join(Theme.PALETTES)}")
+            call = (self.set_theme, args[0])
+        elif command == 'clock-font':
+            family = ' '.join(args).strip()
+            if not family:
+                raise ValueError('clock-font needs a font family name or default')
+            call = (self.set_clock_font, None if family == 'default' else family)
+        elif command in ('seconds', 'date'):
+            if args not in (['on'], ['off']):
+                raise ValueError(f'{command} needs on or off')
+            toggle = self.toggle_seconds if command == 'seconds' else self.toggle_date
+            call = (toggle, args[0] == 'on')
+        else:
+            raise ValueError(f'unknown command: {command}')
+        
+        if not self.commands.post(*call):
+            raise ValueError('clock is busy, try again')
+    
+    def set_clock_visible(self, visible):
+        """Show or hide the clock window; ticking stops while it is hidden"""
+        if visible == (not self.clock_hidden):
+            return
+        self.clock_hidden = not visible
+        self.update_tick_state()
+    
+    def check_idle(self):
+        """Poll session idle/lock state on a slow timer"""
+        self.idle_after_id = None
+        self.wakeups['idle_poll'] += 1
+        idle = session_idle_seconds(self.root)
+        self.session_idle = session_locked() or (idle is not None and idle >= self.idle_timeout)
+        self.update_tick_state()
+        self.idle_after_id = self.root.after(self.IDLE_POLL_MS, self.check_idle)
+    
+    def update_tick_state(self):
+        """Suspend or resume ticking together with the face's visibility
+        
+        The face is faded out whenever ticking stops (hidden, idle or locked)
+        so it never shows a stale time; resuming renders before fading in.
+        """
+        suspend = self.clock_hidden or self.session_idle
+        if suspend == self.ticks_suspended:
+            return
+        self.ticks_suspended = suspend
+        self.stopwatch.set_visible(not suspend)
+        if suspend:
+            self.tick_scheduler.cancel()
+            self.fader.fade(False, self.clock_window.withdraw)
+        else:
+            self.restart_ticks()
+            # A fade-out still in progress leaves the window mapped; fade
+            # back up from wherever it got to
+            if self.clock_window.state() == 'withdrawn':
+                self.fader.set_alpha(0.0)
+                self.clock_window.deiconify()
+            self.fader.fade(True)
+    
+    def wakeup_stats(self):
+        """Timer wakeups of every periodic callback in the process, total, per hour and per source"""
+        sources = dict(self.wakeups)
+        sources['command_poll'] = self.commands.polls
+        sources['alarm'] = self.alarms.wakeups
+        sources['stopwatch_frame'] = self.stopwatch.frames
+        if self.watchdog is not None:
+            sources['watchdog'] = self.watchdog.beats
+        total = sum(sources.values())
+        hours = (time.monotonic() - self.wakeups_started) / 3600
+        return {
+            'wakeups': total,
+            'wakeups_per_hour': round(total / hours, 1) if hours > 0 else 0.0,
+            'by_source': dict(sorted(sources.items())),
+            'suspended': self.ticks_suspended
+        }
+    
+    def on_alarm(self, alarm, missed):
+        """Announce a due alarm through the tray and/or by flashing the clock"""
+        title = {'alarm': 'Alarm', 'reminder': 'Reminder', 'countdown': 'Countdown finished'}[alarm.kind]
+        message = alarm.label or datetime.fromtimestamp(self.now()).strftime('%H:%M')
+        if missed > 60:
+            message += f' (missed by {int(missed // 60)} min)'
+        
+        if alarm.notify and self.tray_icon is not None and getattr(self.tray_icon, 'HAS_NOTIFICATION', False):
+            try:
+                self.tray_icon.notify(message, title)
+            except Exception as e:
+                print(f"Error showing notification: {e}")
+        if alarm.flash or not alarm.notify:
+            self.flash_clock()
+    
+    def flash_clock(self, remaining=10):
+        """Alternate the clock color a few times"""
+        if self.flash_after_id is not None:
+            self.root.after_cancel(self.flash_after_id)
+            self.flash_after_id = None
+        if remaining <= 0:
+            self.apply_clock_color(self.text_color)
+            return
+        self.apply_clock_color(self.FLASH_COLOR if remaining % 2 == 0 else self.text_color)
+        self.flash_after_id = self.root.after(300, self.flash_clock, remaining - 1)
+    
+    def show_stopwatch_text(self, text):
+        self.clock_renderer.show(text)
+        self.last_time_text = text
+    
+    def toggle_stopwatch(self):
+        """Start the stopwatch, or pause/resume it if already showing"""
+        if self.stopwatch.active:
+            self.stopwatch.toggle()
+        else:
+            self.stopwatch.start_stopwatch()
+    
+    def start_countdown(self, seconds):
+        self.stopwatch.start_countdown(seconds)
+    
+    def stop_stopwatch(self):
+        """Leave stopwatch mode and go back to the 1 Hz clock"""
+        if not self.stopwatch.active:
+            return
+        self.stopwatch.off()
+        self.last_time_text = None
+        self.restart_ticks()
+    
+    def set_clock_font(self, family):
+        """Switch the clock face font family; None goes back to the default"""
+        if family is not None and not self.valid_font_family(family):
+            print(f"Error setting clock font: {family!r} is not installed")
+            return
+        self.clock_font = family
+        self.apply_clock_font()
+        self.save_config()
+    
+    def apply_clock_font(self):
+        # Labels share the theme fonts; the canvas renderer keeps its own glyph key
+        if self.theme.set_clock_family(self.clock_font):
+            self.clock_renderer.set_font(self.theme.fonts['clock'])
+            self.update_window_geometry()
+    
+    def set_theme(self, mode):
+        """Recolor menus and popups in place"""
+        if self.theme.set_mode(mode):
+            self.save_config()
+    
+    def set_stopwatch_rate(self, hz):
+        self.stopwatch.set_rate(hz)
+        self.save_config()
+    
+    def on_countdown_finished(self):
+        self.on_alarm(Alarm('countdown', time.time(), 'Time is up'), 0)
     
     def close_app(self, event=None):
+        if self.instance_server:
+            self.instance_server.close()
+        self.commands.close()
+        self.tick_scheduler.cancel()
+        self.stopwatch.cancel()
+        self.alarms.cancel()
+        self.fader.cancel()
+        self.tray_ticks.cancel()
+        if self.font_after_id is not None:
+            self.root.after_cancel(self.font_after_id)
+        if self.flash_after_id is not None:
+            self.root.after_cancel(self.flash_after_id)
+        if self.idle_after_id is not None:
+            self.root.after_cancel(self.idle_after_id)
+        if self.config_after_id is not None:
+            self.root.after_cancel(self.config_after_id)
+        if self.layout_after_id is not None:
+            self.root.after_cancel(self.layout_after_id)
+        if self.time_sync is not None:
+            self.time_sync.stop()
+        if self.watchdog:
+            self.watchdog.stop()
+            self.watchdog.log(json.dumps({'stalls': self.watchdog.summary()}, indent=2))
         self.save_config()
+        self.config_writer.close()
         if self.tray_icon:
             self.tray_icon.stop()
         self.clock_window.destroy()
         self.root.destroy()
     
     def start_move(self, event):
-        self.x = event.x
-        self.y = event.y
+        """Remember where the drag started; the origin is tracked locally from here"""
+        self.drag_origin = (self.x_position, self.y_position)
+        self.drag_pointer = (event.x_root, event.y_root)
+        self.drag_target = self.drag_origin
+        self.drag_stats['drags'] += 1
     
     def on_move(self, event):
-        x = self.clock_window.winfo_x() + event.x - self.x
-        y = self.clock_window.winfo_y() + event.y - self.y
-        self.clock_window.geometry(f'+{x}+{y}')
+        """Record the new target; the window moves at most once per frame"""
+        if self.drag_origin is None:
+            return
+        self.drag_stats['motion_events'] += 1
+        self.drag_target = self.monitors.snap(
+            self.drag_origin[0] + event.x_root - self.drag_pointer[0],
+            self.drag_origin[1] + event.y_root - self.drag_pointer[1],
+            self.window_width,
+            self.window_height
+        )
+        if self.drag_frame_id is None:
+            self.drag_frame_id = self.root.after(self.DRAG_FRAME_MS, self.apply_drag)
+    
+    def apply_drag(self):
+        self.drag_frame_id = None
+        if self.drag_target != (self.x_position, self.y_position):
+            self.x_position, self.y_position = self.drag_target
+            self.clock_window.geometry(f'+{self.x_position}+{self.y_position}')
+            self.drag_stats['geometry_calls'] += 1
     
     def end_move(self, event):
-        """Save position when drag ends"""
+        """Commit the final position and save it when drag ends"""
+        if self.drag_origin is None:
+            return
+        self.on_move(event)
+        if self.drag_frame_id is not None:
+            self.root.after_cancel(self.drag_frame_id)
+        self.apply_drag()
+        self.drag_origin = None
         self.save_config()
     
     def update_time(self):
         """Update time display"""
-        now = datetime.now()
-        
-        # Format time based on settings
-        if self.time_format == '12h':
-            if self.show_seconds:
-                time_string = now.strftime('%I:%M:%S %p')
-            else:
-                time_string = now.strftime('%I:%M %p')
-        else:
-            if self.show_seconds:
-                time_string = now.strftime('%H:%M:%S')
-            else:
-                time_string = now.strftime('%H:%M')
-        
-        # Add date if enabled
-        if self.show_date:
-            date_string = now.strftime('%a, %b %d')
-            time_string = f'{date_string}\n{time_string}'
-        
-        self.time_label.config(text=time_string)
-        self.root.after(1000, self.update_time)
+        self.wakeups['tick'] += 1
+        ts = self.now()
+        time_string, world_texts = self.format_face(ts)
+        
+        # Skip the Tk re-layout when nothing visible changed; the stopwatch
+        # owns the clock face while it is active
+        if time_string != self.last_time_text and not self.stopwatch.active:
+            self.clock_renderer.show(time_string)
+            self.last_time_text = time_string
+        
+        if self.world_labels:
+            for i, text in enumerate(world_texts):
+                if text != self.world_texts[i]:
+                    self.world_labels[i].config(text=text)
+                    self.world_texts[i] = text
+    
+    def restart_ticks(self):
+        """Rebuild the formatter, render now and realign ticking"""
+        self.restart_formatter()
+        if self.ticks_suspended:
+            return
+        period = 1.0 if self.show_seconds else 60.0
+        self.tick_scheduler.start(period)
     
     def run(self):
         self.root.mainloop()
 
 
+def measure_ticks(clock, duration, report_interval):
+    """Run the clock, printing tick lateness and other diagnostics as JSON"""
+    clock.tick_scheduler.stats.reset()
+    cpu_start = time.process_time()
+    
+    def summary():
+        result = clock.collect_diagnostics()
+        result['cpu_s'] = round(time.process_time() - cpu_start, 3)
+        return result
+    
+    def report():
+        print(json.dumps(summary()), flush=True)
+        clock.root.after(int(report_interval * 1000), report)
+    
+    def finish():
+        print(json.dumps(summary(), indent=2), flush=True)
+        clock.close_app()
+    
+    if report_interval:
+        clock.root.after(int(report_interval * 1000), report)
+    if duration:
+        clock.root.after(int(duration * 1000), finish)
+
+
+def bench_stopwatch(clock, seconds_per_rate, rates=(10, 20, 30, 60)):
+    """Run the stopwatch at each refresh rate, print CPU usage per rate as JSON and exit"""
+    results = []
+    pending = list(rates)
+    
+    def start_next():
+        if not pending:
+            clock.stop_stopwatch()
+            print(json.dumps(results, indent=2), flush=True)
+            clock.close_app()
+            return
+        hz = pending.pop(0)
+        stopwatch = clock.stopwatch
+        stopwatch.set_rate(hz)
+        stopwatch.start_stopwatch()
+        frames = stopwatch.frames
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        
+        def finish():
+            cpu_s = time.process_time() - cpu
+            wall_s = time.perf_counter() - wall
+            results.append({
+                'target_hz': hz,
+                'effective_hz': round((stopwatch.frames - frames) / wall_s, 1),
+                'cpu_percent': round(100 * cpu_s / wall_s, 2),
+                'mean_frame_us': round(stopwatch.frame_time.mean * 1e6, 1),
+                'skipped_frames': stopwatch.skipped_frames,
+                'rate_drops': stopwatch.rate_drops
+            })
+            stopwatch.frame_time.reset()
+            start_next()
+        
+        clock.root.after(int(seconds_per_rate * 1000), finish)
+    
+    clock.root.after(1000, start_next)
+
+
+def summarize_ns(samples):
+    """Mean and percentiles of per-call timings in nanoseconds"""
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        'count': count,
+        'mean_ns': round(sum(samples) / count),
+        'p50_ns': samples[count // 2],
+        'p99_ns': samples[min(count - 1, int(count * 0.99))],
+        'max_ns': samples[-1]
+    }
+
+
+def time_calls(function, args_list):
+    """Time one call per argument tuple with perf_counter_ns"""
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter_ns()
+        function(*args)
+        samples.append(time.perf_counter_ns() - t0)
+    return summarize_ns(samples)
+
+
+def bench_ticks(directory, ticks):
+    """Face formatting cost per tick for every format combination and with world clocks"""
+    variants = [
+        {'time_format': fmt, 'show_seconds': seconds, 'show_date': date}
+        for fmt in ('24h', '12h') for seconds in (True, False) for date in (False, True)
+    ]
+    variants.append({
+        'time_format': '24h',
+        'show_seconds': True,
+        'show_date': False,
+        'world_clocks': [{'zone': 'Europe/London'}, {'zone': 'America/New_York'}, {'zone': 'Asia/Tokyo'}]
+    })
+    
+    # Consecutive seconds from the last Sunday of March, crossing a DST change
+    start = datetime(2024, 3, 31).timestamp()
+    path = os.path.join(directory, 'bench_ticks.json')
+    rows = []
+    for variant in variants:
+        with open(path, 'w') as f:
+            json.dump(variant, f)
+        model = ClockModel(path)
+        row = {key: value for key, value in variant.items() if key != 'world_clocks'}
+        row['world_clocks'] = len(model.world_clock.zones)
+        row.update(time_calls(model.format_face, [(start + i,) for i in range(ticks)]))
+        model.config_writer.close()
+        rows.append(row)
+    return rows
+
+
+def bench_config_io(directory, rounds):
+    """Config load speed, atomic write throughput, coalescing and a save/load round trip"""
+    path = os.path.join(directory, 'bench_config.json')
+    model = ClockModel(path)
+    model.save_config()
+    model.config_writer.flush()
+    result = {'load': time_calls(model.load_config, [()] * rounds)}
+    
+    writer = ConfigWriter(path, delay=0, max_delay=0)
+    config = model.config_dict()
+    t0 = time.perf_counter()
+    for i in range(rounds):
+        config['y_position'] = i
+        writer.submit(config)
+        writer.flush()
+    elapsed = time.perf_counter() - t0
+    writer.close()
+    result['write'] = {
+        'count': rounds,
+        'writes_per_s': round(rounds / elapsed, 1),
+        'mean_us': round(elapsed / rounds * 1e6, 1),
+        'errors': writer.errors
+    }
+    
+    # A burst of changes, as from a slider drag, should end up as one write
+    writer = ConfigWriter(path)
+    for i in range(rounds):
+        config['x_position'] = i
+        writer.submit(config)
+    writer.close()
+    result['burst'] = writer.stats()
+    
+    model.x_position, model.font_size, model.show_date = 123, 40, True
+    model.save_config()
+    model.config_writer.close()
+    reloaded = ClockModel(path)
+    reloaded.config_writer.close()
+    result['roundtrip_ok'] = reloaded.config_dict() == model.config_dict()
+    return result
+
+
+def bench_icons(directory, faces, sheet=True):
+    """Static tray icon, live face draw, sprite sheet build/load and per-minute swap costs"""
+    if importlib.util.find_spec('PIL') is None:
+        return {'skipped': 'PIL is not installed'}
+    
+    result = {'static': time_calls(draw_tray_icon, [()] * faces)}
+    minutes = [(m // 60 % 12, m % 60) for m in range(0, faces * 7, 7)]
+    for style in ('analog', 'digital'):
+        atlas = TrayFaceAtlas(style, '24h', directory, 'Segoe UI')
+        result[style] = time_calls(atlas.draw, minutes)
+    
+    if sheet:
+        atlas = TrayFaceAtlas('analog', '24h', directory, 'Segoe UI')
+        atlas.load_sheet()
+        cached = TrayFaceAtlas('analog', '24h', directory, 'Segoe UI')
+        t0 = time.perf_counter()
+        cached.load_sheet()
+        result['sheet'] = {
+            'faces': 60 * atlas.hours,
+            'build_s': atlas.sheet_build_s,
+            'cache_load_s': round(time.perf_counter() - t0, 3),
+            'cache_used': cached.sheet_source == 'cache'
+        }
+        base = datetime(2024, 1, 1)
+        result['swap'] = time_calls(cached.frame, [(base + timedelta(minutes=i),) for i in range(faces)])
+    return result
+
+
+def bench_startup(directory):
+    """Headless startup phases: config load, first face and shutdown"""
+    path = os.path.join(directory, 'bench_startup.json')
+    profiler = StartupProfiler(time.perf_counter())
+    clock = HeadlessClock(path, out=io.StringIO())
+    profiler.mark('load_config')
+    clock.tick(time.time())
+    profiler.mark('first_face')
+    clock.config_writer.close()
+    profiler.mark('shutdown')
+    return profiler.summary()
+
+
+def run_benchmarks(profiler, quick=False):
+    """Run the headless benchmark suite; returns a JSON-serializable report"""
+    ticks, rounds, faces = (3600, 50, 20) if quick else (86400, 500, 120)
+    with tempfile.TemporaryDirectory(prefix='transparent_clock_bench_') as directory:
+        results = {
+            'process_startup': profiler.summary(),
+            'startup': bench_startup(directory),
+            'ticks': bench_ticks(directory, ticks),
+            'config_io': bench_config_io(directory, rounds),
+            'icons': bench_icons(directory, faces, sheet=not quick)
+        }
+    return {
+        'schema': 1,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'quick': quick,
+        'results': results
+    }
+
+
+def main(argv=None):
+    profiler = StartupProfiler()
+    profiler.mark('imports')
+    
+    parser = argparse.ArgumentParser(description='Transparent desktop clock')
+    parser.add_argument('command', nargs='*',
+                        help='command for the running clock: show, hide, customize, format, exit, diagnostics [FILE], '
+                             'alarm HH:MM [LABEL], alarm-daily HH:MM [LABEL], remind MINUTES [LABEL], '
+                             'countdown SECONDS|MM:SS [LABEL], cancel-alarm ID, clear-alarms, '
+                             'stopwatch [start|toggle|pause|resume|reset|off], timer SECONDS|MM:SS, stopwatch-rate HZ, '
+                             'font-size N, opacity PERCENT, color #RRGGBB, time-format 12h|24h, seconds on|off, '
+                             'date on|off, tray-icon static|analog|digital, theme light|dark, '
+                             'time-sync on [SERVER[:PORT]]|off')
+    parser.add_argument('--new-instance', action='store_true',
+                        help='start a separate clock even if one is already running')
+    parser.add_argument('--measure-ticks', type=float, metavar='SECONDS',
+                        help='measure tick lateness for SECONDS (0 = until exit) and print JSON stats')
+    parser.add_argument('--report-interval', type=float, default=60.0, metavar='SECONDS',
+                        help='interval between intermediate reports with --measure-ticks')
+    parser.add_argument('--bench-format', type=int, nargs='?', const=86400, metavar='TICKS',
+                        help='benchmark the time formatter against strftime and exit')
+    parser.add_argument('--bench-zones', type=int, nargs='?', const=600, metavar='TICKS',
+                        help='benchmark world clock formatting for 1-500 zones and exit')
+    parser.add_argument('--profile-startup', nargs='?', const='-', metavar='FILE',
+                        help='print per-phase startup timings as JSON (or write them to FILE)')
+    parser.add_argument('--watchdog', type=int, metavar='MS',
+                        help='report event loop stalls longer than MS milliseconds (0 = off)')
+    parser.add_argument('--bench-stopwatch', type=float, nargs='?', const=10.0, metavar='SECONDS',
+                        help='run the stopwatch at 10/20/30/60 Hz for SECONDS each, print CPU usage and exit')
+    parser.add_argument('--headless', type=float, nargs='?', const=0.0, metavar='SECONDS',
+                        help='run the clock without a window or tray icon, printing each new time, '
+                             'for SECONDS (0 = until Ctrl+C)')
+    parser.add_argument('--bench-suite', nargs='?', const='-', metavar='FILE',
+                        help='run the headless benchmark suite (ticks, config I/O, icons, startup) '
+                             'and print JSON results (or write them to FILE)')
+    parser.add_argument('--quick', action='store_true',
+                        help='shorter runs for --bench-suite')
+    parser.add_argument('--sntp-server', type=int, nargs='?', const=12300, metavar='PORT',
+                        help='run a local stand-in SNTP server on 127.0.0.1:PORT until Ctrl+C')
+    parser.add_argument('--sntp-offset', type=float, default=0.0, metavar='SECONDS',
+                        help='offset the stand-in SNTP server adds to its clock')
+    parser.add_argument('--renderer', choices=sorted(RENDERERS),
+                        help='clock face renderer to use instead of the configured one')
+    args = parser.parse_args(argv)
+    
+    if args.bench_format:
+        print(f"{'format':<7}{'seconds':<9}{'date':<7}{'strftime ns':>13}{'cached ns':>11}{'speedup':>9}")
+        for row in bench_format(args.bench_format):
+            print(f"{row['time_format']:<7}{str(row['show_seconds']):<9}{str(row['show_date']):<7}"
+                  f"{row['strftime_ns_per_tick']:>13}{row['formatter_ns_per_tick']:>11}{row['speedup']:>9}")
+        return 0
+    
+    if args.bench_zones:
+        print(f"{'zones':>6}{'tz convert us':>15}{'cached us':>11}{'ns/zone':>9}")
+        for row in bench_zones((1, 10, 50, 100, 250, 500), args.bench_zones):
+            print(f"{row['zones']:>6}{row['tz_convert_us_per_tick']:>15}"
+                  f"{row['cached_us_per_tick']:>11}{row['cached_ns_per_zone']:>9}")
+        return 0
+    
+    if args.bench_suite:
+        report = json.dumps(run_benchmarks(profiler, args.quick), indent=2)
+        if args.bench_suite == '-':
+            print(report)
+        else:
+            with open(args.bench_suite, 'w') as f:
+                f.write(report)
+        return 0
+    
+    if args.sntp_server is not None:
+        server = SNTPServer(offset=args.sntp_offset, port=args.sntp_server)
+        print(f"Stand-in SNTP server on {server.address[0]}:{server.address[1]} "
+              f"(offset {args.sntp_offset:+g} s), Ctrl+C to stop", flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        server.close()
+        return 0
+    
+    if args.headless is not None:
+        HeadlessClock().run(args.headless)
+        return 0
+    
+    # Hand off to an already running clock instead of starting another one
+    command = args.command or ['show']
+    
+    def forward(reply):
+        if not reply.get('ok'):
+            print(f"Error: {reply.get('error')}", file=sys.stderr)
+            return 1
+        return 0
+    
+    if not args.new_instance:
+        reply = send_command(command[0], command[1:])
+        if reply is not None:
+            return forward(reply)
+        if args.command and command[0] != 'show':
+            print("Error: Transparent Clock is not running", file=sys.stderr)
+            return 1
+    
+    instance_server = None
+    if not args.new_instance:
+        try:
+            instance_server = InstanceServer()
+        except InstanceRunning as e:
+            # Lost the race to another launch, it may still be writing IPC_FILE
+            for _ in range(10):
+                time.sleep(0.2)
+                reply = send_command(command[0], command[1:])
+                if reply is not None:
+                    return forward(reply)
+            print(f"Error: another instance holds the lock ({e}) but does not answer", file=sys.stderr)
+            return 1
+        except OSError as e:
+            print(f"Error starting instance server: {e}")
+    
+    profiler.mark('instance_check')
+    
+    def report_startup():
+        report = json.dumps(profiler.summary(), indent=2)
+        if args.profile_startup == '-':
+            print(report, flush=True)
+        else:
+            with open(args.profile_startup, 'w') as f:
+                f.write(report)
+    
+    on_tray_ready = report_startup if args.profile_startup else None
+    
+    clock = TransparentClock(
+        renderer=args.renderer,
+        profiler=profiler,
+        on_tray_ready=on_tray_ready,
+        instance_server=instance_server,
+        watchdog_ms=args.watchdog
+    )
+    if args.measure_ticks is not None:
+        measure_ticks(clock, args.measure_ticks, args.report_interval)
+    if args.bench_stopwatch:
+        bench_stopwatch(clock, args.bench_stopwatch)
+    clock.run()
+    return 0
+
+
 if __name__ == '__main__':
-    clock = TransparentClock()
-    clock.run()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,125 @@
+import threading
+import types
+
+import pytest
+
+pytest.importorskip('tkinter')
+from main import CommandQueue
+
+
+class FakeRoot:
+    """Tk root stand-in: timers and virtual events run only when the test pumps them
+    
+    There is no file handler support, like Tk on Windows; threaded selects
+    whether posting threads can deliver the <<CommandQueued>> event.
+    """
+    
+    def __init__(self, threaded=True, deliver=True):
+        self.tk = types.SimpleNamespace(eval=lambda script: '1' if threaded else '0')
+        self.deliver = deliver
+        self.timers = {}
+        self.next_id = 0
+        self.bindings = {}
+        self.events = []
+        self.lock = threading.Lock()
+    
+    def after(self, ms, func, *args):
+        self.next_id += 1
+        self.timers[self.next_id] = (ms, func, args)
+        return self.next_id
+    
+    def after_cancel(self, after_id):
+        self.timers.pop(after_id, None)
+    
+    def bind(self, sequence, func, add=None):
+        self.bindings[sequence] = func
+    
+    def event_generate(self, sequence, when=None):
+        if not self.deliver:
+            raise RuntimeError('main thread is not in main loop')
+        with self.lock:
+            self.events.append(sequence)
+    
+    def pump_events(self):
+        with self.lock:
+            events, self.events = self.events, []
+        for sequence in events:
+            self.bindings[sequence](None)
+    
+    def fire_timers(self):
+        """Run every pending timer once"""
+        timers, self.timers = self.timers, {}
+        for ms, func, args in timers.values():
+            func(*args)
+    
+    def poll_delay(self, queue):
+        return self.timers[queue.after_id][0]
+
+
+def test_posts_from_threads_all_run_once():
+    root = FakeRoot()
+    queue = CommandQueue(root, maxsize=4096)
+    ran = []
+    
+    def hammer(thread):
+        for i in range(500):
+            assert queue.post(ran.append, (thread, i))
+    
+    threads = [threading.Thread(target=hammer, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    while len(ran) < 2000:
+        root.pump_events()
+        root.fire_timers()
+    
+    assert queue.stats()['executed'] == 2000
+    assert queue.stats()['wakeup'] == 'event'
+    for thread in range(4):
+        assert [i for t, i in ran if t == thread] == list(range(500))
+
+
+def test_full_queue_drops_and_counts():
+    queue = CommandQueue(FakeRoot(), maxsize=2)
+    
+    assert [queue.post(print) for _ in range(3)] == [True, True, False]
+    assert queue.stats()['dropped'] == 1
+
+
+def test_event_wakeup_backs_off_to_safety_poll():
+    root = FakeRoot()
+    queue = CommandQueue(root, safety_poll_ms=400)
+    
+    delays = []
+    for _ in range(6):
+        root.fire_timers()
+        delays.append(root.poll_delay(queue))
+    assert delays == [100, 200, 400, 400, 400, 400]
+
+
+def test_missed_event_wakeup_polls_soon():
+    root = FakeRoot(deliver=False)
+    queue = CommandQueue(root, safety_poll_ms=400)
+    for _ in range(4):
+        root.fire_timers()
+    ran = []
+    
+    queue.post(ran.append, 1)
+    root.fire_timers()
+    assert ran == [1]
+    assert root.poll_delay(queue) == queue.min_poll_ms
+    assert queue.stats()['missed_wakeups'] == 1
+
+
+def test_polling_without_threads_stays_responsive_after_a_command():
+    root = FakeRoot(threaded=False)
+    queue = CommandQueue(root, poll_ms=50, idle_poll_ms=1000)
+    for _ in range(8):
+        root.fire_timers()
+    assert root.poll_delay(queue) == 1000
+    
+    queue.post(print)
+    root.fire_timers()
+    assert root.poll_delay(queue) == 50
+    assert queue.stats()['wakeup'] == 'poll'
@@ -0,0 +1,92 @@
+import pytest
+
+from clock_core import SNTPServer, TimeSync
+
+
+class FakeClock:
+    """Monotonic clock that only moves when a test advances it"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def sntp_server():
+    servers = []
+    
+    def start(**options):
+        server = SNTPServer(**options)
+        servers.append(server)
+        return f'127.0.0.1:{server.address[1]}', server
+    
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_estimate_drops_asymmetric_samples(sntp_server):
+    address, server = sntp_server(offset=2.5, delay=0.01, spike_every=3, spike=0.2)
+    sync = TimeSync(address, samples=6, sample_gap=0.02)
+    
+    assert sync.sync_once()
+    assert sync.slew[2] == pytest.approx(2.5, abs=0.05)
+    assert sync.discarded >= 1
+    assert server.requests == 6
+
+
+def test_unanswered_server_fails_with_error(sntp_server):
+    address, _ = sntp_server(drop=True)
+    sync = TimeSync(address, samples=1)
+    sync.TIMEOUT = 0.05
+    
+    assert not sync.sync_once()
+    assert sync.last_error is not None
+
+
+def test_offset_slews_at_bounded_rate(clock):
+    sync = TimeSync('127.0.0.1', monotonic=clock)
+    sync.set_target(1.0)
+    
+    assert sync.offset() == 0.0
+    clock.advance(2.0)
+    assert sync.offset() == pytest.approx(2.0 * TimeSync.SLEW_RATE)
+    clock.advance(100.0)
+    assert sync.offset() == 1.0
+
+
+def test_large_offset_is_stepped(clock):
+    sync = TimeSync('127.0.0.1', monotonic=clock)
+    sync.set_target(TimeSync.STEP_THRESHOLD + 60.0)
+    
+    assert sync.offset() == TimeSync.STEP_THRESHOLD + 60.0
+
+
+def test_carried_offset_is_held_then_slewed(clock):
+    sync = TimeSync('127.0.0.1', offset=0.3, monotonic=clock)
+    clock.advance(10.0)
+    assert sync.offset() == 0.3
+    
+    sync.set_target(0.5)
+    clock.advance(1.0)
+    assert sync.offset() == pytest.approx(0.3 + TimeSync.SLEW_RATE)
+
+
+def test_failures_back_off_to_cap_and_reset_on_success():
+    sync = TimeSync('127.0.0.1', interval=1024.0, min_retry=16.0, max_retry=64.0)
+    
+    assert [sync.next_wait(False) for _ in range(5)] == [16.0, 32.0, 64.0, 64.0, 64.0]
+    assert sync.failures == 5
+    assert sync.next_wait(True) == 1024.0
+    assert sync.consecutive_failures == 0
+    assert sync.next_wait(False) == 16.0